@@ -24,10 +24,15 @@ try:
     import pwd
 except ImportError:
     pwd = None
+try:
+    import threading
+except ImportError:
+    import dummy_threading as threading
 
 from . import _common
 from ._common import deprecated_method
 from ._common import memoize
+from ._compat import basestring as _basestring
 from ._compat import callable
 from ._compat import long
 from ._compat import PY3 as _PY3
@@ -173,20 +178,21 @@ __all__ = [
     "WINDOWS",
 
     # classes
-    "Process", "Popen",
+    "Process", "Popen", "RateTracker",
 
     # functions
     "pid_exists", "pids", "process_iter", "wait_procs",             # proc
     "virtual_memory", "swap_memory",                                # memory
     "cpu_times", "cpu_percent", "cpu_times_percent", "cpu_count",   # cpu
     "net_io_counters", "net_connections", "net_if_addrs",           # network
-    "net_if_stats",
+    "net_if_stats", "iter_connections", "pid_for_port",
+    "net_connections_summary",
     "disk_io_counters", "disk_partitions", "disk_usage",            # disk
     "users", "boot_time",                                           # others
 ]
 __all__.extend(_psplatform.__extra__all__)
 __author__ = "Giampaolo Rodola'"
-__version__ = "4.0.0"
+__version__ = "4.1.0"
 version_info = tuple([int(num) for num in __version__.split('.')])
 AF_LINK = _psplatform.AF_LINK
 _TOTAL_PHYMEM = None
@@ -1257,6 +1263,74 @@ class Popen(Process):
         return ret
 
 
+# =====================================================================
+# --- RateTracker class
+# =====================================================================
+
+
+class RateTracker(object):
+    """Turn the monotonic counters returned by 'func' into per-second
+    rates. 'func' is a callable taking no arguments and returning a
+    number, a namedtuple or a dict of namedtuples, such as
+    net_io_counters, disk_io_counters or
+    lambda: net_io_counters(pernic=True).
+
+    Every call to rates() samples 'func' and compares the result with
+    the previous sample taken on behalf of the same consumer ('key'),
+    so that multiple independent consumers can share the same
+    instance. Counters wrapping around (32 or 64 bit) are compensated
+    for, and dict keys (e.g. NICs or disks) may appear or disappear
+    between samples.
+
+    'gauges' lists namedtuple fields or dict keys holding a current
+    amount rather than a cumulative count (e.g. 'in_flight' of
+    disk_io_counters()): their current value is returned instead of
+    a rate.
+
+    The class is thread safe.
+    """
+
+    def __init__(self, func, gauges=()):
+        if not callable(func):
+            raise TypeError("%r is not callable" % func)
+        self._func = func
+        self._gauges = frozenset(gauges)
+        self._lock = threading.Lock()
+        self._samples = {}
+
+    def __repr__(self):
+        return "%s(%r)" % (self.__class__.__name__, self._func)
+
+    def rates(self, key=None):
+        """Return per-second rates of the counters since the previous
+        call made by the consumer identified by 'key'. The first call
+        made by a consumer returns zero rates (gauges excepted).
+        """
+        with self._lock:
+            counters = self._func()
+            now = _timer()
+            last = self._samples.get(key)
+            self._samples[key] = (now, counters)
+        if last is None:
+            return _common.counters_rates(None, counters, 0, self._gauges)
+        then, before = last
+        return _common.counters_rates(before, counters, now - then,
+                                      self._gauges)
+
+    def counters(self, key=None):
+        """Return the counters sampled by the last rates() call made
+        by the consumer identified by 'key', or None.
+        """
+        with self._lock:
+            last = self._samples.get(key)
+        return None if last is None else last[1]
+
+    def reset(self, key=None):
+        """Forget the last sample taken on behalf of 'key'."""
+        with self._lock:
+            self._samples.pop(key, None)
+
+
 # =====================================================================
 # --- system processes related functions
 # =====================================================================
@@ -1687,9 +1761,10 @@ def virtual_memory():
        the actual amount of available memory that can be given
        instantly to processes that request more memory in bytes; this
        is calculated by summing different memory values depending on
-       the platform (e.g. free + buffers + cached on Linux) and it is
+       the platform (e.g. free + buffers + cached on BSD) and it is
        supposed to be used to monitor actual memory usage in a cross
-       platform fashion.
+       platform fashion. On Linux >= 3.14 this is MemAvailable as
+       estimated by the kernel.
 
      - percent:
        the percentage usage calculated as (total - available) / total * 100
@@ -1752,6 +1827,61 @@ def swap_memory():
     return _psplatform.swap_memory()
 
 
+if hasattr(_psplatform, "memory_snapshot"):
+
+    def memory_snapshot():
+        """Return a (virtual, swap, meminfo) namedtuple where 'virtual'
+        and 'swap' are the same as virtual_memory() and swap_memory()
+        and 'meminfo' is a dict including all /proc/meminfo fields
+        (in bytes), all of them taken from a single read of
+        /proc/meminfo.
+        """
+        global _TOTAL_PHYMEM
+        ret = _psplatform.memory_snapshot()
+        _TOTAL_PHYMEM = ret.virtual.total
+        return ret
+
+    __all__.append("memory_snapshot")
+
+
+if hasattr(_psplatform, "vmstat"):
+
+    def vmstat(gauges=True):
+        """Return all the virtual memory statistics found in
+        /proc/vmstat (e.g. pgfault, pgmajfault, pgscan_direct,
+        allocstall, oom_kill) as a dict of ints.
+        Most of them are cumulative counters, but some (mostly nr_*
+        ones, e.g. nr_free_pages) are gauges: if 'gauges' is False
+        these are left out, so that
+        RateTracker(lambda: psutil.vmstat(gauges=False)) can be used
+        in order to get per-second rates.
+        """
+        return _psplatform.vmstat(gauges=gauges)
+
+    __all__.append("vmstat")
+
+
+if hasattr(_psplatform, "pressure"):
+
+    def pressure(resource, cgroup=None):
+        """Return pressure stall information (PSI) about 'resource'
+        ('cpu', 'memory', 'io' or 'irq') as a (some, full) namedtuple.
+        'some' is the share of time at least one task was stalled
+        waiting for the resource, 'full' the share of time all
+        non-idle tasks were stalled at the same time (None if not
+        available); both include avg10, avg60 and avg300 percentages
+        and the total stall time in microseconds.
+        If 'cgroup' is a cgroup v2 path such as the ones found in
+        /proc/{pid}/cgroup (e.g. "/system.slice/sshd.service") return
+        the pressure of that cgroup instead of the system-wide one.
+        """
+        return _psplatform.pressure(resource, cgroup=cgroup)
+
+    PressureTrigger = _psplatform.PressureTrigger
+
+    __all__.extend(["pressure", "PressureTrigger"])
+
+
 # =====================================================================
 # --- disks/paritions related functions
 # =====================================================================
@@ -1765,7 +1895,120 @@ def disk_usage(path):
     return _psplatform.disk_usage(path)
 
 
-def disk_partitions(all=False):
+if hasattr(_psplatform, "disk_usage_inodes"):
+
+    # mountpoints whose statvfs() call made by disk_usage_all() is
+    # still pending (e.g. a hung NFS mount)
+    _disk_usage_pending = set()
+    _disk_usage_lock = threading.Lock()
+    # a statvfs() call taking longer than this is assumed to be hung
+    _DISK_USAGE_HUNG_AFTER = 1.0
+
+    def disk_usage_all(all=False, timeout=5, workers=8):
+        """Return disk usage of all mounted partitions as returned by
+        disk_partitions(all) as a dict mapping mountpoints to
+        namedtuples including the disk_usage() fields plus inodes
+        usage (inodes_total, inodes_used, inodes_free, inodes_percent).
+
+        Mountpoints are queried in parallel by 'workers' threads.
+        A query taking more than one second is assumed to be hung
+        (e.g. a hung NFS mount): its thread is left behind and a new
+        one takes over the remaining mountpoints. A hung mountpoint is
+        not queried again, and hence costs no more threads, until the
+        pending query returns.
+        The function returns after at most 'timeout' seconds:
+        mountpoints which did not answer in time are mapped to None.
+        Mountpoints which can't be queried (e.g. due to permissions)
+        are omitted.
+        """
+        if workers < 1:
+            raise ValueError("workers must be >= 1 (got %r)" % workers)
+        mountpoints = []
+        for part in disk_partitions(all=all):
+            if part.mountpoint not in mountpoints:
+                mountpoints.append(part.mountpoint)
+        retdict = dict.fromkeys(mountpoints)
+        with _disk_usage_lock:
+            todo = [x for x in reversed(mountpoints)
+                    if x not in _disk_usage_pending]
+        # {thread: time its current query started or None}; threads
+        # which are left behind are removed
+        busy = {}
+        cond = threading.Condition()
+
+        def worker():
+            me = threading.current_thread()
+            while True:
+                with _disk_usage_lock:
+                    path = todo.pop() if todo else None
+                    if path is not None:
+                        _disk_usage_pending.add(path)
+                with cond:
+                    if path is None:
+                        busy.pop(me, None)
+                        cond.notify()
+                        return
+                    busy[me] = _timer()
+                    cond.notify()
+                try:
+                    ret = _psplatform.disk_usage_inodes(path)
+                except EnvironmentError:
+                    ret = None
+                finally:
+                    with _disk_usage_lock:
+                        _disk_usage_pending.discard(path)
+                with cond:
+                    if ret is None:
+                        retdict.pop(path, None)
+                    elif path in retdict:
+                        retdict[path] = ret
+                    if me not in busy:
+                        # we've been left behind
+                        return
+                    busy[me] = None
+
+        def spawn():
+            t = threading.Thread(target=worker)
+            t.daemon = True
+            busy[t] = None
+            t.start()
+
+        stop_at = _timer() + timeout if timeout is not None else None
+        with cond:
+            for x in range(min(workers, len(todo))):
+                spawn()
+            while busy:
+                now = _timer()
+                if stop_at is not None and now >= stop_at:
+                    break
+                wait = None if stop_at is None else stop_at - now
+                for t, started in list(busy.items()):
+                    if started is None:
+                        continue
+                    left = started + _DISK_USAGE_HUNG_AFTER - now
+                    if left > 0:
+                        wait = left if wait is None else min(wait, left)
+                        continue
+                    del busy[t]
+                    with _disk_usage_lock:
+                        replace = bool(todo)
+                    if replace:
+                        spawn()
+                if busy:
+                    cond.wait(wait)
+        with _disk_usage_lock:
+            # don't start querying mountpoints after we returned
+            del todo[:]
+        with cond:
+            ret = retdict.copy()
+            # results arriving late are discarded
+            retdict.clear()
+        return ret
+
+    __all__.append("disk_usage_all")
+
+
+def disk_partitions(all=False, extended=False):
     """Return mounted partitions as a list of
     (device, mountpoint, fstype, opts) namedtuple.
     'opts' field is a raw string separated by commas indicating mount
@@ -1773,11 +2016,21 @@ def disk_partitions(all=False):
 
     If "all" parameter is False return physical devices only and ignore
     all others.
+
+    On Linux, if 'extended' is True, namedtuples have 6 additional
+    fields taken from /proc/self/mountinfo: mount_id, parent_id,
+    major, minor (of the mounted device), root (the directory of the
+    filesystem mounted on mountpoint) and propagation (e.g.
+    ('shared:1', )).
     """
+    if LINUX:
+        return _psplatform.disk_partitions(all, extended=extended)
+    if extended:
+        raise ValueError("'extended' argument is only supported on Linux")
     return _psplatform.disk_partitions(all)
 
 
-def disk_io_counters(perdisk=False):
+def disk_io_counters(perdisk=False, disks=None):
     """Return system disk I/O statistics as a namedtuple including
     the following fields:
 
@@ -1793,10 +2046,21 @@ def disk_io_counters(perdisk=False):
     with partition names as the keys and the namedtuple
     described above as the values.
 
+    On Linux, if 'disks' is a list of disk names, only the
+    statistics of those disks are read (from /sys/class/block),
+    which is faster on systems with many disks.
+
     On recent Windows versions 'diskperf -y' command may need to be
     executed first otherwise this function won't find any disk.
     """
-    rawdict = _psplatform.disk_io_counters()
+    if disks is not None:
+        if not LINUX:
+            raise ValueError("'disks' argument is only supported on Linux")
+        if isinstance(disks, _basestring):
+            disks = [disks]
+        rawdict = _psplatform.disk_io_counters(disks=disks)
+    else:
+        rawdict = _psplatform.disk_io_counters()
     if not rawdict:
         raise RuntimeError("couldn't find any physical disk")
     nt = getattr(_psplatform, "sdiskio", _common.sdiskio)
@@ -1808,12 +2072,74 @@ def disk_io_counters(perdisk=False):
         return nt(*[sum(x) for x in zip(*rawdict.values())])
 
 
+if hasattr(_psplatform, "disk_io_stats"):
+
+    def disk_io_stats(interval=1.0, sampler=None):
+        """Return iostat-like metrics for every disk as a dictionary
+        with disk names as the keys and namedtuples as the values:
+
+         - read_per_sec, write_per_sec: reads / writes per second
+         - read_bytes_per_sec, write_bytes_per_sec: throughput
+         - r_await, w_await: average time (in milliseconds) reads /
+           writes took, including time spent in queue
+         - avgqu_sz: average number of queued requests
+         - util: percentage of time the disk was busy
+         - in_flight: number of requests currently in progress
+
+        Metrics are computed by comparing two disk_io_counters() samples
+        taken 'interval' seconds apart (blocking).
+        If 'sampler' is a RateTracker instance wrapping
+        lambda: disk_io_counters(perdisk=True) the call does not block
+        and metrics refer to the time elapsed since its previous
+        sample; the first call returns zeroes.
+        """
+        if sampler is None:
+            if interval is None or interval <= 0:
+                raise ValueError("interval is not positive (got %r)" % (
+                    interval, ))
+            sampler = RateTracker(lambda: disk_io_counters(perdisk=True),
+                                  gauges=['in_flight'])
+            sampler.rates()
+            time.sleep(interval)
+        rates = sampler.rates()
+        counters = sampler.counters()
+        if not isinstance(rates, dict):
+            raise TypeError("sampler is expected to return per-disk counters "
+                            "(got %r)" % (rates, ))
+        return _psplatform.disk_io_stats(rates, counters)
+
+    __all__.append("disk_io_stats")
+
+
+if hasattr(_psplatform, "disk_topology"):
+
+    def disk_topology():
+        """Return the block devices of the system as a dictionary
+        with kernel names (e.g. 'dm-0') as the keys and namedtuples
+        as the values:
+
+         - name: friendly name (e.g. the device-mapper or md array
+           name); the kernel name if none
+         - type: 'disk', 'part', the md RAID level (e.g. 'raid1') or
+           the device-mapper target (e.g. 'lvm', 'crypt')
+         - parents: devices this device is built on top of
+         - children: devices built on top of this device (e.g.
+           partitions or LVM volumes)
+
+        Devices with no children are the ones which can be summed
+        without counting the same I/O twice.
+        """
+        return _psplatform.disk_topology()
+
+    __all__.append("disk_topology")
+
+
 # =====================================================================
 # --- network related functions
 # =====================================================================
 
 
-def net_io_counters(pernic=False):
+def net_io_counters(pernic=False, netns=None):
     """Return network I/O statistics as a namedtuple including
     the following fields:
 
@@ -1831,8 +2157,17 @@ def net_io_counters(pernic=False):
     network interface installed on the system as a dictionary
     with network interface names as the keys and the namedtuple
     described above as the values.
+
+    On Linux, if 'netns' is a PID, interfaces of the network
+    namespace of that process are returned instead of the ones of
+    the current namespace (see net_namespaces()).
     """
-    rawdict = _psplatform.net_io_counters()
+    if netns is not None:
+        if not LINUX:
+            raise ValueError("'netns' argument is only supported on Linux")
+        rawdict = _psplatform.net_io_counters(netns=netns)
+    else:
+        rawdict = _psplatform.net_io_counters()
     if not rawdict:
         raise RuntimeError("couldn't find any network interface")
     if pernic:
@@ -1843,7 +2178,8 @@ def net_io_counters(pernic=False):
         return _common.snetio(*[sum(x) for x in zip(*rawdict.values())])
 
 
-def net_connections(kind='inet'):
+def net_connections(kind='inet', status=None, lport=None, rport=None,
+                    pid=None, netns=None, extended=False):
     """Return system-wide connections as a list of
     (fd, family, type, laddr, raddr, status, pid) namedtuples.
     In case of limited privileges 'fd' and 'pid' may be set to -1
@@ -1864,12 +2200,159 @@ def net_connections(kind='inet'):
     unix            UNIX socket (both UDP and TCP protocols)
     all             the sum of all the possible families and protocols
 
+    Results can further be filtered by 'status' (a CONN_* constant or
+    a sequence of them), local port ('lport'), remote port ('rport')
+    and 'pid'. On Linux these filters are applied while connections
+    are being retrieved, which is considerably faster than filtering
+    the returned list.
+
+    On Linux, if 'netns' is a PID, connections of the network
+    namespace of that process are returned instead of the ones of
+    the current namespace (see net_namespaces()).
+
+    On Linux, if 'extended' is True, namedtuples have 9 additional
+    fields: 'inode', 'rqueue' and 'wqueue' (the bytes queued for
+    receiving and sending), 'peer_inode' and 'peer_pid' which
+    identify the other end of connected UNIX sockets, plus 'rtt',
+    'rttvar' (in milliseconds), 'retransmits' and 'cwnd' for TCP
+    sockets.
+
     On OSX this function requires root privileges.
     """
-    return _psplatform.net_connections(kind)
+    if LINUX:
+        return _psplatform.net_connections(kind, status=status, lport=lport,
+                                           rport=rport, pid=pid, netns=netns,
+                                           extended=extended)
+    if netns is not None:
+        raise ValueError("'netns' argument is only supported on Linux")
+    if extended:
+        raise ValueError("'extended' argument is only supported on Linux")
+    ret = _psplatform.net_connections(kind)
+    if status is None and lport is None and rport is None and pid is None:
+        return ret
+    return _common.filter_connections(ret, status=status, lport=lport,
+                                      rport=rport, pid=pid)
+
+
+def iter_connections(kind='inet', status=None, lport=None, rport=None,
+                     pid=None, unique=False, netns=None, extended=False):
+    """Same as net_connections() but return a generator yielding
+    connections as they are read instead of a list.
+    On Linux this uses a constant amount of memory regardless of the
+    number of connections. Identical entries (e.g. unnamed UNIX
+    sockets whose owner cannot be determined) are returned as many
+    times as they are found unless 'unique' is True, in which case
+    already returned connections are kept in memory in order to
+    discard duplicates, like net_connections() does.
+    """
+    if LINUX:
+        return _psplatform.iter_connections(
+            kind, status=status, lport=lport, rport=rport, pid=pid,
+            unique=unique, netns=netns, extended=extended)
+    return iter(net_connections(kind, status=status, lport=lport,
+                                rport=rport, pid=pid, netns=netns,
+                                extended=extended))
+
+
+def net_connections_summary(kind='inet', group_by=('pid', 'status')):
+    """Return the number of system-wide connections grouped by one or
+    more fields as a dict. 'group_by' can be a field name, in which
+    case dict keys are the values of that field, or a sequence of
+    field names, in which case keys are tuples. Fields are:
+
+     - family
+     - type
+     - status
+     - lport: local port (0 if none, None for UNIX sockets)
+     - rport: remote port (0 if none, None for UNIX sockets)
+     - pid: None if it cannot be determined
+
+    'kind' is the same as net_connections().
+    Each socket is counted once, or once per process using it when
+    grouping by 'pid'.
+    On Linux connections are counted while being read, without
+    decoding addresses, and processes are not looked at unless
+    grouping by 'pid', which makes this a lot cheaper than counting
+    net_connections() results.
+    """
+    if LINUX:
+        return _psplatform.net_connections_summary(kind, group_by=group_by)
+    return _common.summarize_connections(net_connections(kind), group_by)
+
+
+def pid_for_port(port, kind='tcp', status=CONN_LISTEN):
+    """Return the PID of the process owning a socket bound to the
+    given local port or None if it cannot be determined (e.g. no such
+    socket or insufficient privileges).
+    'kind' is the same as net_connections() except "unix" and "all"
+    which are not supported; 'status' is a CONN_* constant or a
+    sequence of them (None means any status). Use CONN_NONE for UDP
+    sockets.
+    On Linux this is a lot faster than searching net_connections()
+    as processes' file descriptors are looked at only until the
+    socket is found.
+    """
+    if LINUX:
+        return _psplatform.pid_for_port(port, kind=kind, status=status)
+    for conn in net_connections(kind, status=status, lport=port):
+        if conn.pid is not None:
+            return conn.pid
+    return None
+
+
+if hasattr(_psplatform, "net_namespaces"):
+
+    def net_namespaces():
+        """Return the network namespaces processes belong to as a
+        dict whose keys are namespace IDs (the inode number of
+        /proc/{pid}/ns/net) and values are lists of PIDs.
+        Any of these PIDs can be passed as the 'netns' argument of
+        net_connections() and net_io_counters() in order to read
+        each namespace exactly once.
+        Processes which cannot be inspected due to insufficient
+        privileges are not included.
+        """
+        return _psplatform.net_namespaces()
+
+    __all__.append("net_namespaces")
+
 
+if hasattr(_psplatform, "connection_table"):
 
-def net_if_addrs():
+    def connection_table(kind='inet'):
+        """Return system-wide TCP and UDP connections stored
+        column-wise as parallel arrays (family, type, status, laddr,
+        lport, raddr, rport, inode, pid, fd) rather than as a list of
+        namedtuples. IP addresses are left in packed form.
+        This is a lot faster and takes a lot less memory than
+        net_connections() on systems with many connections and is
+        meant for aggregating connections, optionally via NumPy
+        (see as_numpy() method).
+        'kind' is the same as net_connections() except "unix" and
+        "all" which are not supported.
+        """
+        return _psplatform.connection_table(kind)
+
+    __all__.append("connection_table")
+
+
+if hasattr(_psplatform, "net_if_links"):
+
+    def net_if_links():
+        """Return the status, MTU and detailed 64-bit I/O statistics
+        of every NIC as a dictionary whose keys are the NIC names and
+        values are namedtuples including 'isup', 'mtu' plus all the
+        rtnl_link_stats64 counters (rx_bytes, rx_missed_errors,
+        rx_fifo_errors, tx_carrier_errors, etc.).
+        All NICs are retrieved at once via a netlink RTM_GETLINK
+        request.
+        """
+        return _psplatform.net_if_links()
+
+    __all__.append("net_if_links")
+
+
+def net_if_addrs(cached=False):
     """Return the addresses associated to each NIC (network interface
     card) installed on the system as a dictionary whose keys are the
     NIC names and value is a list of namedtuples for each address
@@ -1891,7 +2374,14 @@ def net_if_addrs():
 
     Note: you can have more than one address of the same family
     associated with each interface.
+
+    On Linux, if 'cached' is True, the result is cached until the
+    kernel signals that a NIC or an address changed. It is ignored
+    on other platforms.
     """
+    if cached and LINUX:
+        ret = _psplatform.net_if_cache.get(net_if_addrs)
+        return dict([(k, list(v)) for k, v in ret.items()])
     has_enums = sys.version_info >= (3, 4)
     if has_enums:
         import socket
@@ -1915,7 +2405,7 @@ def net_if_addrs():
     return dict(ret)
 
 
-def net_if_stats():
+def net_if_stats(cache_ttl=None, cached=False):
     """Return information about each NIC (network interface card)
     installed on the system as a dictionary whose keys are the
     NIC names and value is a namedtuple with the following fields:
@@ -1926,7 +2416,17 @@ def net_if_stats():
      - speed: the NIC speed expressed in mega bits (MB); if it can't
               be determined (e.g. 'localhost') it will be set to 0.
      - mtu: the maximum transmission unit expressed in bytes.
+
+    On Linux, if 'cache_ttl' is a number, duplex and speed (which
+    rarely change) are cached and reused for that many seconds
+    unless the NIC status changes. If 'cached' is True the whole
+    result is cached until the kernel signals that a NIC changed.
+    Both are ignored on other platforms.
     """
+    if cached and LINUX:
+        return dict(_psplatform.net_if_cache.get(_psplatform.net_if_stats))
+    if LINUX:
+        return _psplatform.net_if_stats(cache_ttl=cache_ttl)
     return _psplatform.net_if_stats()
 
 
@@ -24,6 +24,13 @@ try:
 except ImportError:
     import dummy_threading as threading
 
+# same as _compat.basestring, which can't be imported from here as
+# setup.py imports this module alone
+if sys.version_info[0] >= 3:
+    basestring = str
+else:
+    basestring = basestring  # NOQA
+
 if sys.version_info >= (3, 4):
     import enum
 else:
@@ -234,6 +241,135 @@ def socktype_to_enum(num):
             return num
 
 
+def conn_statuses(status):
+    """Normalize the 'status' filter accepted by net_connections(),
+    which can be a CONN_* constant or a sequence of them, to a
+    frozenset (or None if no filter was specified).
+    """
+    if status is None:
+        return None
+    if isinstance(status, basestring):
+        return frozenset([status])
+    return frozenset(status)
+
+
+def filter_connections(conns, status=None, lport=None, rport=None,
+                       pid=None):
+    """Filter a list of sconn namedtuples by status (a CONN_* constant
+    or a sequence of them), local port, remote port and PID.
+    Used on platforms which cannot apply these filters while
+    retrieving connections.
+    """
+    statuses = conn_statuses(status)
+    ret = []
+    for conn in conns:
+        if statuses is not None and conn.status not in statuses:
+            continue
+        if lport is not None and \
+                (not isinstance(conn.laddr, tuple) or
+                 conn.laddr[1:] != (lport, )):
+            continue
+        if rport is not None and \
+                (not isinstance(conn.raddr, tuple) or
+                 conn.raddr[1:] != (rport, )):
+            continue
+        if pid is not None and conn.pid != pid:
+            continue
+        ret.append(conn)
+    return ret
+
+
+def summary_fields(group_by):
+    """Validate the 'group_by' argument of net_connections_summary()
+    and return it as a tuple of field names.
+    """
+    if isinstance(group_by, basestring):
+        fields = (group_by, )
+    else:
+        fields = tuple(group_by)
+    if not fields:
+        raise ValueError("no group_by fields specified")
+    for name in fields:
+        if name not in conn_summary_fields:
+            raise ValueError(
+                "invalid %r group_by field; choose between %s" % (
+                    name, ', '.join([repr(x) for x in conn_summary_fields])))
+    return fields
+
+
+def summarize_connections(conns, group_by):
+    """Count a list of sconn namedtuples grouped by 'group_by'
+    fields, see net_connections_summary().
+    """
+    fields = summary_fields(group_by)
+    ret = {}
+    for conn in conns:
+        if isinstance(conn.laddr, tuple):
+            lport = conn.laddr[1] if conn.laddr else 0
+            rport = conn.raddr[1] if conn.raddr else 0
+        else:
+            # UNIX socket
+            lport = rport = None
+        row = dict(family=conn.family, type=conn.type, status=conn.status,
+                   lport=lport, rport=rport, pid=conn.pid)
+        if isinstance(group_by, basestring):
+            key = row[group_by]
+        else:
+            key = tuple([row[x] for x in fields])
+        ret[key] = ret.get(key, 0) + 1
+    return ret
+
+
+def counter_delta(before, after):
+    """Return the increase of a monotonic counter going from 'before'
+    to 'after', compensating for 32-bit and 64-bit wraparounds.
+    A decrease which cannot be explained by a wraparound is assumed
+    to be a counter reset, in which case 'after' is returned.
+    """
+    if after >= before:
+        return after - before
+    wrap = 1 << 32 if before < (1 << 32) else 1 << 64
+    delta = after + wrap - before
+    if delta > wrap // 2:
+        # counter reset (e.g. NIC driver reloaded)
+        return after
+    return delta
+
+
+def counters_rates(before, after, elapsed, gauges=()):
+    """Return per-second rates of the counters in 'after' compared to
+    'before', sampled 'elapsed' seconds earlier. Both can be numbers,
+    (named)tuples or dicts of those, as returned by functions such as
+    net_io_counters(pernic=True). Dict keys which are not in 'before'
+    get zero rates; keys which are not in 'after' are ignored.
+    Namedtuple fields and dict keys listed in 'gauges' hold a current
+    amount rather than a cumulative count (e.g. in_flight): their
+    value in 'after' is returned as is.
+    """
+    if isinstance(after, dict):
+        if not isinstance(before, dict):
+            before = {}
+        return dict([(k, v if k in gauges else
+                      counters_rates(before.get(k), v, elapsed, gauges))
+                     for k, v in after.items()])
+    if isinstance(after, tuple):
+        if before is None or not elapsed:
+            rates = [0.0] * len(after)
+        else:
+            rates = [counter_delta(b, a) / float(elapsed)
+                     for b, a in zip(before, after)]
+        if gauges:
+            for i, name in enumerate(getattr(after, '_fields', ())):
+                if name in gauges:
+                    rates[i] = after[i]
+        if hasattr(after, '_make'):
+            return after._make(rates)
+        return tuple(rates)
+    if before is None or not elapsed:
+        return 0.0
+    return counter_delta(before, after) / float(elapsed)
+
+
 def deprecated_method(replacement):
     """A decorator which can be used to mark a method as deprecated
     'replcement' is the method name which will be called instead.
@@ -278,6 +414,9 @@ if AF_UNIX is not None:
 
 del AF_INET, AF_INET6, AF_UNIX, SOCK_STREAM, SOCK_DGRAM
 
+# net_connections_summary() 'group_by' fields
+conn_summary_fields = ('family', 'type', 'status', 'lport', 'rport', 'pid')
+
 
 # --- namedtuples for psutil.* system-related functions
 
@@ -286,6 +425,9 @@ sswap = namedtuple('sswap', ['total', 'used', 'free', 'percent', 'sin',
                              'sout'])
 # psutil.disk_usage()
 sdiskusage = namedtuple('sdiskusage', ['total', 'used', 'free', 'percent'])
+# psutil.disk_usage_all()
+sdiskusagex = namedtuple('sdiskusagex', sdiskusage._fields + (
+    'inodes_total', 'inodes_used', 'inodes_free', 'inodes_percent'))
 # psutil.disk_io_counters()
 sdiskio = namedtuple('sdiskio', ['read_count', 'write_count',
                                  'read_bytes', 'write_bytes',
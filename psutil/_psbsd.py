@@ -309,6 +309,7 @@ else:
 
 pids = cext.pids
 disk_usage = _psposix.disk_usage
+disk_usage_inodes = _psposix.disk_usage_inodes
 net_io_counters = cext.net_io_counters
 disk_io_counters = cext.disk_io_counters
 net_if_addrs = cext_posix.net_if_addrs
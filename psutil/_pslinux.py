@@ -6,14 +6,17 @@
 
 from __future__ import division
 
-import base64
+import array
+import binascii
 import errno
 import functools
 import os
 import re
+import select
 import socket
 import struct
 import sys
+import time
 import traceback
 import warnings
 from collections import defaultdict
@@ -35,6 +38,7 @@ from ._common import usage_percent
 from ._compat import b
 from ._compat import basestring
 from ._compat import long
+from ._compat import lru_cache
 from ._compat import PY3
 
 if sys.version_info >= (3, 4):
@@ -42,6 +46,11 @@ if sys.version_info >= (3, 4):
 else:
     enum = None
 
+try:
+    import threading
+except ImportError:
+    import dummy_threading as threading
+
 
 __extra__all__ = [
     #
@@ -58,6 +67,8 @@ __extra__all__ = [
 
 HAS_SMAPS = os.path.exists('/proc/%s/smaps' % os.getpid())
 HAS_PRLIMIT = hasattr(cext, "linux_prlimit")
+HAS_SOCK_DIAG = hasattr(cext, "net_connections_inet")
+HAS_NET_IF_LINKS = hasattr(cext, "net_if_links")
 
 # RLIMIT_* constants, not guaranteed to be present on all kernels
 if HAS_PRLIMIT:
@@ -74,6 +85,14 @@ BOOT_TIME = None  # set later
 # speedup, see: https://github.com/giampaolo/psutil/issues/708
 BIGGER_FILE_BUFFERING = -1 if PY3 else 8192
 LITTLE_ENDIAN = sys.byteorder == 'little'
+# net/if.h
+IFF_UP = 0x1
+# linux/rtnetlink.h
+NETLINK_ROUTE = 0
+RTMGRP_LINK = 0x1
+RTMGRP_IPV4_IFADDR = 0x10
+RTMGRP_IPV6_IFADDR = 0x100
+_timer = getattr(time, 'monotonic', time.time)
 if PY3:
     FS_ENCODING = sys.getfilesystemencoding()
     ENCODING_ERRORS_HANDLER = 'surrogateescape'
@@ -128,6 +147,14 @@ TCP_STATUSES = {
     "0B": _common.CONN_CLOSING
 }
 
+# Same as above but indexed by the numeric state returned by
+# NETLINK_SOCK_DIAG. 12 is TCP_NEW_SYN_RECV (Linux >= 4.4), which
+# /proc/net/tcp shows as SYN_RECV.
+TCP_STATUSES_DIAG = dict((int(k, 16), v) for k, v in TCP_STATUSES.items())
+TCP_STATUSES_DIAG[12] = _common.CONN_SYN_RECV
+# bitmask including all TCP states, used to filter sock_diag results
+TCPF_ALL = 0xFFF
+
 # set later from __init__.py
 NoSuchProcess = None
 ZombieProcess = None
@@ -179,18 +206,30 @@ def readlink(path):
     return path
 
 
-def get_sector_size():
-    try:
-        with open(b"/sys/block/sda/queue/hw_sector_size") as f:
-            return int(f.read())
-    except (IOError, ValueError):
-        # man iostat states that sectors are equivalent with blocks and
-        # have a size of 512 bytes since 2.4 kernels. This value is
-        # needed to calculate the amount of disk I/O in bytes.
-        return 512
+# The kernel always expresses the sectors read and written listed in
+# /proc/diskstats in units of 512 bytes, regardless of the actual
+# sector size of the device (e.g. 4Kn disks), see:
+# https://www.kernel.org/doc/Documentation/block/stat.txt
+# include/linux/types.h ("Linux always considers sectors to be 512
+# bytes long independently of the devices real block size").
+SECTOR_SIZE = 512
+# one entry for every block device (disks, partitions, dm, md, ...)
+BLOCK_SYSFS_PATH = "/sys/class/block"
 
 
-SECTOR_SIZE = get_sector_size()
+@memoize
+def fd_dir_has_size(procfs_path):
+    """Return True if stat()ing /proc/{pid}/fd reports the number of
+    open file descriptors in st_size (Linux >= 6.2), which is way
+    cheaper than listing the directory. On older kernels st_size is
+    always 0.
+    """
+    try:
+        # the current process always has some fds open (at least the
+        # one of the Python interpreter itself)
+        return os.stat("%s/self/fd" % procfs_path).st_size > 0
+    except OSError:
+        return False
 
 
 # --- named tuples
@@ -231,11 +270,42 @@ except Exception:
 svmem = namedtuple(
     'svmem', ['total', 'available', 'percent', 'used', 'free',
               'active', 'inactive', 'buffers', 'cached'])
+# pressure()
+spsi = namedtuple('spsi', ['avg10', 'avg60', 'avg300', 'total'])
+spressure = namedtuple('spressure', ['some', 'full'])
+smemsnapshot = namedtuple('smemsnapshot', ['virtual', 'swap', 'meminfo'])
 sdiskio = namedtuple('sdiskio', ['read_count', 'write_count',
                                  'read_bytes', 'write_bytes',
                                  'read_time', 'write_time',
                                  'read_merged_count', 'write_merged_count',
-                                 'busy_time'])
+                                 'busy_time', 'in_flight', 'weighted_time',
+                                 'discard_count', 'discard_merged_count',
+                                 'discard_bytes', 'discard_time',
+                                 'flush_count', 'flush_time'])
+sdiskpartx = namedtuple('sdiskpartx', _common.sdiskpart._fields + (
+    'mount_id', 'parent_id', 'major', 'minor', 'root', 'propagation'))
+sdisktopo = namedtuple('sdisktopo', ['name', 'type', 'parents', 'children'])
+# iostat-like metrics returned by disk_io_stats()
+sdiskstats = namedtuple('sdiskstats', ['read_per_sec', 'write_per_sec',
+                                       'read_bytes_per_sec',
+                                       'write_bytes_per_sec',
+                                       'r_await', 'w_await', 'avgqu_sz',
+                                       'util', 'in_flight'])
+
+sconnx = namedtuple('sconnx', _common.sconn._fields + (
+    'inode', 'rqueue', 'wqueue', 'peer_inode', 'peer_pid', 'rtt', 'rttvar',
+    'retransmits', 'cwnd'))
+
+# rtnl_link_stats64 fields, in kernel order
+snetlink = namedtuple('snetlink', [
+    'isup', 'mtu',
+    'rx_packets', 'tx_packets', 'rx_bytes', 'tx_bytes', 'rx_errors',
+    'tx_errors', 'rx_dropped', 'tx_dropped', 'multicast', 'collisions',
+    'rx_length_errors', 'rx_over_errors', 'rx_crc_errors',
+    'rx_frame_errors', 'rx_fifo_errors', 'rx_missed_errors',
+    'tx_aborted_errors', 'tx_carrier_errors', 'tx_fifo_errors',
+    'tx_heartbeat_errors', 'tx_window_errors', 'rx_compressed',
+    'tx_compressed', 'rx_nohandler'])
 
 pmem = namedtuple('pmem', 'rss vms shared text lib data dirty')
 pfullmem = namedtuple('pfullmem', pmem._fields + ('uss', 'pss', 'swap'))
@@ -251,52 +321,87 @@ pmmap_ext = namedtuple(
 
 # --- system memory
 
-def virtual_memory():
-    total, free, buffers, shared, _, _, unit_multiplier = cext.linux_sysinfo()
-    total *= unit_multiplier
-    free *= unit_multiplier
-    buffers *= unit_multiplier
-    # XXX: tis is currently not used (neither returned) because it's
-    # always 0. It would be nice to have though ('free' provides it).
-    # shared *= unit_multiplier
-
-    cached = active = inactive = None
+def meminfo():
+    """Parse /proc/meminfo and return a dict mapping all of its
+    fields (e.g. 'MemAvailable', 'Shmem', 'Dirty') to their values,
+    in bytes, or as plain numbers for fields which are not expressed
+    in kB (e.g. 'HugePages_Total').
+    """
+    retdict = {}
     with open_binary('%s/meminfo' % get_procfs_path()) as f:
         for line in f:
-            if line.startswith(b"Cached:"):
-                cached = int(line.split()[1]) * 1024
-            elif line.startswith(b"Active:"):
-                active = int(line.split()[1]) * 1024
-            elif line.startswith(b"Inactive:"):
-                inactive = int(line.split()[1]) * 1024
-            if (cached is not None and
-                    active is not None and
-                    inactive is not None):
-                break
-        else:
-            # we might get here when dealing with exotic Linux flavors, see:
-            # https://github.com/giampaolo/psutil/issues/313
-            msg = "'cached', 'active' and 'inactive' memory stats couldn't " \
-                  "be determined and were set to 0"
-            warnings.warn(msg, RuntimeWarning)
-            cached = active = inactive = 0
+            fields = line.split()
+            if len(fields) < 2:
+                continue
+            name = fields[0].rstrip(b':')
+            if PY3:
+                name = name.decode('ascii')
+            value = int(fields[1])
+            if len(fields) > 2:
+                # "kB"
+                value *= 1024
+            retdict[name] = value
+    return retdict
+
 
-    avail = free + buffers + cached
+def virtual_memory(mems=None):
+    if mems is None:
+        mems = meminfo()
+    try:
+        total = mems['MemTotal']
+        free = mems['MemFree']
+        buffers = mems['Buffers']
+    except KeyError:
+        total, free, buffers, _, _, _, unit_multiplier = \
+            cext.linux_sysinfo()
+        total *= unit_multiplier
+        free *= unit_multiplier
+        buffers *= unit_multiplier
+
+    try:
+        cached = mems['Cached']
+        active = mems['Active']
+        inactive = mems['Inactive']
+    except KeyError:
+        # we might get here when dealing with exotic Linux flavors, see:
+        # https://github.com/giampaolo/psutil/issues/313
+        msg = "'cached', 'active' and 'inactive' memory stats couldn't " \
+              "be determined and were set to 0"
+        warnings.warn(msg, RuntimeWarning)
+        cached = active = inactive = 0
+
+    # MemAvailable (Linux >= 3.14) is the kernel's estimate of how much
+    # memory can be allocated without swapping, which also accounts for
+    # reclaimable slab and for page cache which can't be dropped; see:
+    # https://git.kernel.org/cgit/linux/kernel/git/torvalds/linux.git/
+    #     commit/?id=34e431b0ae398fc54ea69ff85ec700722c9da773
+    avail = mems.get('MemAvailable')
+    if avail is None:
+        avail = free + buffers + cached
     used = total - free
     percent = usage_percent((total - avail), total, _round=1)
     return svmem(total, avail, percent, used, free,
                  active, inactive, buffers, cached)
 
 
-def swap_memory():
-    _, _, _, _, total, free, unit_multiplier = cext.linux_sysinfo()
-    total *= unit_multiplier
-    free *= unit_multiplier
+def swap_memory(mems=None):
+    if mems is None:
+        try:
+            mems = meminfo()
+        except IOError:
+            mems = {}
+    try:
+        total = mems['SwapTotal']
+        free = mems['SwapFree']
+    except KeyError:
+        _, _, _, _, total, free, unit_multiplier = cext.linux_sysinfo()
+        total *= unit_multiplier
+        free *= unit_multiplier
     used = total - free
     percent = usage_percent(used, total, _round=1)
     # get pgin/pgouts
     try:
-        f = open_binary("%s/vmstat" % get_procfs_path())
+        vmstats = vmstat()
     except IOError as err:
         # see https://github.com/giampaolo/psutil/issues/722
         msg = "'sin' and 'sout' swap memory stats couldn't " \
@@ -304,28 +409,62 @@ def swap_memory():
         warnings.warn(msg, RuntimeWarning)
         sin = sout = 0
     else:
-        with f:
-            sin = sout = None
-            for line in f:
-                # values are expressed in 4 kilo bytes, we want
-                # bytes instead
-                if line.startswith(b'pswpin'):
-                    sin = int(line.split(b' ')[1]) * 4 * 1024
-                elif line.startswith(b'pswpout'):
-                    sout = int(line.split(b' ')[1]) * 4 * 1024
-                if sin is not None and sout is not None:
-                    break
-            else:
-                # we might get here when dealing with exotic Linux
-                # flavors, see:
-                # https://github.com/giampaolo/psutil/issues/313
-                msg = "'sin' and 'sout' swap memory stats couldn't " \
-                      "be determined and were set to 0"
-                warnings.warn(msg, RuntimeWarning)
-                sin = sout = 0
+        try:
+            # values are expressed in 4 kilo bytes, we want
+            # bytes instead
+            sin = vmstats['pswpin'] * 4 * 1024
+            sout = vmstats['pswpout'] * 4 * 1024
+        except KeyError:
+            # we might get here when dealing with exotic Linux
+            # flavors, see:
+            # https://github.com/giampaolo/psutil/issues/313
+            msg = "'sin' and 'sout' swap memory stats couldn't " \
+                  "be determined and were set to 0"
+            warnings.warn(msg, RuntimeWarning)
+            sin = sout = 0
     return _common.sswap(total, used, free, percent, sin, sout)
 
 
+# /proc/vmstat nr_* fields are gauges (e.g. nr_free_pages), except
+# these ones which are cumulative counters
+VMSTAT_NR_COUNTERS = frozenset([
+    'nr_dirtied', 'nr_written', 'nr_throttled_written', 'nr_vmscan_write',
+    'nr_vmscan_immediate_reclaim', 'nr_foll_pin_acquired',
+    'nr_foll_pin_released'])
+# ...and these ones are gauges as well
+VMSTAT_GAUGES = frozenset(['workingset_nodes'])
+
+
+def vmstat(gauges=True):
+    """Parse /proc/vmstat and return a dict mapping all of its fields
+    (e.g. 'pgfault', 'pgmajfault', 'allocstall') to their values.
+    If 'gauges' is False only cumulative counters are returned.
+    """
+    retdict = {}
+    with open_binary('%s/vmstat' % get_procfs_path()) as f:
+        for line in f:
+            fields = line.split()
+            if len(fields) != 2:
+                continue
+            name = fields[0]
+            if PY3:
+                name = name.decode('ascii')
+            if not gauges and (name in VMSTAT_GAUGES or (
+                    name.startswith('nr_') and
+                    name not in VMSTAT_NR_COUNTERS)):
+                continue
+            retdict[name] = int(fields[1])
+    return retdict
+
+
+def memory_snapshot():
+    """Return virtual memory, swap memory and all /proc/meminfo
+    fields, reading /proc/meminfo only once.
+    """
+    mems = meminfo()
+    return smemsnapshot(virtual_memory(mems), swap_memory(mems), mems)
+
+
 # --- CPUs
 
 def cpu_times():
@@ -469,44 +608,103 @@ class _Ipv6UnsupportedError(Exception):
     pass
 
 
-class Connections:
-    """A wrapper on top of /proc/net/* files, retrieving per-process
-    and system-wide open connections (TCP, UDP, UNIX) similarly to
-    "netstat -an".
+# IPv6 addresses in /proc/net/* are displayed as four 32-bit words
+# in host byte order
+_IPV6_WORDS_LE = struct.Struct('<4I')
+_IPV6_WORDS_BE = struct.Struct('>4I')
+if PY3:
+    _unhexlify = bytes.fromhex
+else:
+    _unhexlify = binascii.unhexlify
 
-    Note: in case of UNIX sockets we're only able to determine the
-    local endpoint/path, not the one it's connected to.
-    According to [1] it would be possible but not easily.
 
-    [1] http://serverfault.com/a/417946
+# Many connections share the same addresses (e.g. the local ones) so
+# decoded IP addresses are cached.
+
+@lru_cache(maxsize=4096)
+def _inet_ntop(family, ip):
+    """Cached version of socket.inet_ntop()."""
+    return socket.inet_ntop(family, ip)
+
+
+@lru_cache(maxsize=4096)
+def _decode_ip(ip, family):
+    """Convert an IP address as displayed in /proc/net/* into a
+    human readable form (see Connections.decode_address()).
+    """
+    return socket.inet_ntop(family, Connections.pack_address(ip, family))
+
+
+def tcp_states_mask(statuses):
+    """Convert a set of CONN_* constants into a bitmask of TCP
+    states (1 << state) as used by NETLINK_SOCK_DIAG.
+    """
+    mask = 0
+    for state, status in TCP_STATUSES_DIAG.items():
+        if status in statuses:
+            mask |= 1 << state
+    return mask
+
+
+class InodeIndex:
+    """A socket inode -> [(pid, fd), ...] index of all processes,
+    which is kept in memory and updated incrementally across calls.
+
+    Finding out which process owns a socket means reading all the
+    /proc/{pid}/fd/* links of all processes, which is by far the
+    slowest part of net_connections(). Instead, only fds which were
+    not there as of last scan are read.
+    Since a process may close an fd and reuse its number, the owners
+    of a socket found in the index are checked again by reading
+    their links (see verify()) and a socket inode which is not in the
+    index triggers a full rescan (once per call); inodes still not
+    found after that (e.g. because their owner is not accessible) are
+    remembered so that they won't trigger a rescan again.
     """
 
     def __init__(self):
-        tcp4 = ("tcp", socket.AF_INET, socket.SOCK_STREAM)
-        tcp6 = ("tcp6", socket.AF_INET6, socket.SOCK_STREAM)
-        udp4 = ("udp", socket.AF_INET, socket.SOCK_DGRAM)
-        udp6 = ("udp6", socket.AF_INET6, socket.SOCK_DGRAM)
-        unix = ("unix", socket.AF_UNIX, None)
-        self.tmap = {
-            "all": (tcp4, tcp6, udp4, udp6, unix),
-            "tcp": (tcp4, tcp6),
-            "tcp4": (tcp4,),
-            "tcp6": (tcp6,),
-            "udp": (udp4, udp6),
-            "udp4": (udp4,),
-            "udp6": (udp6,),
-            "unix": (unix,),
-            "inet": (tcp4, tcp6, udp4, udp6),
-            "inet4": (tcp4, udp4),
-            "inet6": (tcp6, udp6),
-        }
+        self._lock = threading.Lock()
         self._procfs_path = None
+        self._reset()
+
+    def _reset(self):
+        # {pid: {fd: inode or None}}
+        self._fds = {}
+        # {inode: ((pid, fd), ...)}
+        self._inodes = {}
+        # inodes which were not found as of last full rescan
+        self._orphans = set()
+
+    def _add(self, inode, pid, fd):
+        self._inodes[inode] = self._inodes.get(inode, ()) + ((pid, fd), )
+
+    def _remove(self, inode, pid, fd):
+        pairs = tuple([x for x in self._inodes.get(inode, ())
+                       if x != (pid, fd)])
+        if pairs:
+            self._inodes[inode] = pairs
+        else:
+            self._inodes.pop(inode, None)
 
-    def get_proc_inodes(self, pid):
-        inodes = defaultdict(list)
-        for fd in os.listdir("%s/%s/fd" % (self._procfs_path, pid)):
+    def _forget(self, pid):
+        for fd, inode in self._fds.pop(pid, {}).items():
+            if inode is not None:
+                self._remove(inode, pid, int(fd))
+
+    def _scan(self, pid, full):
+        """(Re)read the fds of 'pid'. If 'full' is False only fds
+        which were not there as of last scan are read.
+        Return a {fd: inode} dict of the sockets of 'pid'.
+        """
+        path = "%s/%s/fd" % (self._procfs_path, pid)
+        old = self._fds.get(pid, {})
+        new = {}
+        for fd in os.listdir(path):
+            if not full and fd in old:
+                new[fd] = old[fd]
+                continue
             try:
-                inode = readlink("%s/%s/fd/%s" % (self._procfs_path, pid, fd))
+                inode = readlink("%s/%s" % (path, fd))
             except OSError as err:
                 # ENOENT == file which is gone in the meantime;
                 # os.stat('/proc/%s' % self.pid) will be done later
@@ -515,21 +713,32 @@ class Connections:
                     continue
                 elif err.errno == errno.EINVAL:
                     # not a link
+                    new[fd] = None
                     continue
                 else:
                     raise
+            if inode.startswith('socket:['):
+                # the process is using a socket
+                new[fd] = inode[8:][:-1]
             else:
-                if inode.startswith('socket:['):
-                    # the process is using a socket
-                    inode = inode[8:][:-1]
-                    inodes[inode].append((pid, int(fd)))
-        return inodes
-
-    def get_all_inodes(self):
-        inodes = {}
-        for pid in pids():
+                new[fd] = None
+        for fd, inode in old.items():
+            if inode is not None and new.get(fd) != inode:
+                self._remove(inode, pid, int(fd))
+        for fd, inode in new.items():
+            if inode is not None and old.get(fd) != inode:
+                self._add(inode, pid, int(fd))
+        self._fds[pid] = new
+        return dict([(fd, inode) for fd, inode in new.items()
+                     if inode is not None])
+
+    def _update(self, full=False):
+        current = set(pids())
+        for pid in set(self._fds) - current:
+            self._forget(pid)
+        for pid in current:
             try:
-                inodes.update(self.get_proc_inodes(pid))
+                self._scan(pid, full)
             except OSError as err:
                 # os.listdir() is gonna raise a lot of access denied
                 # exceptions in case of unprivileged user; that's fine
@@ -541,8 +750,219 @@ class Connections:
                 if err.errno not in (
                         errno.ENOENT, errno.ESRCH, errno.EPERM, errno.EACCES):
                     raise
+                self._forget(pid)
+
+    def _check_procfs_path(self, procfs_path):
+        if procfs_path != self._procfs_path:
+            self._procfs_path = procfs_path
+            self._reset()
+
+    def scan_pid(self, procfs_path, pid):
+        """Re-read all fds of 'pid' and return a
+        {inode: [(pid, fd), ...]} dict of its sockets.
+        """
+        with self._lock:
+            self._check_procfs_path(procfs_path)
+            try:
+                socks = self._scan(pid, full=True)
+            except OSError:
+                self._forget(pid)
+                raise
+        inodes = defaultdict(list)
+        for fd, inode in socks.items():
+            inodes[inode].append((pid, int(fd)))
         return inodes
 
+    def snapshot(self, procfs_path):
+        """Bring the index up to date and return a read-only
+        {inode: ((pid, fd), ...)} mapping.
+        """
+        with self._lock:
+            self._check_procfs_path(procfs_path)
+            self._update()
+        return _InodeIndexView(self)
+
+    def repair(self):
+        """Rescan all fds of all processes."""
+        with self._lock:
+            self._update(full=True)
+            self._orphans = set()
+
+    def verify(self, inode):
+        """Return the (pid, fd) pairs of 'inode' whose fd still refers
+        to it. The others are removed from the index and their fds
+        will be read again on next scan.
+        """
+        with self._lock:
+            pairs = self._inodes.get(inode, ())
+            procfs_path = self._procfs_path
+        target = "socket:[%s]" % inode
+        ret = []
+        for pid, fd in pairs:
+            try:
+                if readlink("%s/%s/fd/%s" % (procfs_path, pid, fd)) == \
+                        target:
+                    ret.append((pid, fd))
+                    continue
+            except OSError:
+                pass
+            with self._lock:
+                self._remove(inode, pid, fd)
+                self._fds.get(pid, {}).pop(str(fd), None)
+        return tuple(ret)
+
+    def find_owner(self, procfs_path, inodes):
+        """Return the PID of a process owning any of the given socket
+        inodes or None. Processes are looked at only until the socket
+        is found, starting from the owners known by the index (if any).
+        """
+        with self._lock:
+            self._check_procfs_path(procfs_path)
+            hints = []
+            for inode in inodes:
+                hints.extend(self._inodes.get(inode, ()))
+        targets = set(["socket:[%s]" % x for x in inodes])
+        for pid, fd in hints:
+            try:
+                if readlink("%s/%s/fd/%s" % (procfs_path, pid, fd)) in \
+                        targets:
+                    return pid
+            except OSError:
+                pass
+        for pid in pids():
+            try:
+                if self._has_link(procfs_path, pid, targets):
+                    return pid
+            except OSError as err:
+                if err.errno not in (
+                        errno.ENOENT, errno.ESRCH, errno.EPERM, errno.EACCES):
+                    raise
+        return None
+
+    @staticmethod
+    def _has_link(procfs_path, pid, targets):
+        path = "%s/%s/fd" % (procfs_path, pid)
+        for fd in os.listdir(path):
+            try:
+                if readlink("%s/%s" % (path, fd)) in targets:
+                    return True
+            except OSError as err:
+                if err.errno not in (errno.ENOENT, errno.ESRCH, errno.EINVAL):
+                    raise
+        return False
+
+
+class _InodeIndexView:
+    """The mapping returned by InodeIndex.snapshot(). Owners of the
+    inodes looked up are verified; looking up an inode which has no
+    owner left triggers a full rescan the first time this happens.
+    """
+
+    def __init__(self, index):
+        self._index = index
+        self._repaired = False
+        # {inode: ((pid, fd), ...)} of the verified owners
+        self._owners = {}
+
+    def __contains__(self, inode):
+        if inode in self._owners:
+            return True
+        if inode == '0':
+            # sockets in TIME_WAIT state or not accepted yet have no
+            # inode
+            return False
+        index = self._index
+        owners = index.verify(inode)
+        if not owners and inode not in index._orphans and \
+                not self._repaired:
+            self._repaired = True
+            index.repair()
+            owners = index.verify(inode)
+        if owners:
+            self._owners[inode] = owners
+            return True
+        index._orphans.add(inode)
+        return False
+
+    def __getitem__(self, inode):
+        if inode not in self:
+            raise KeyError(inode)
+        return self._owners[inode]
+
+
+class Connections:
+    """A wrapper on top of NETLINK_SOCK_DIAG and /proc/net/* files,
+    retrieving per-process and system-wide open connections (TCP, UDP,
+    UNIX) similarly to "netstat -an".
+
+    Note: in case of UNIX sockets we're only able to determine the
+    local endpoint/path, not the one it's connected to.
+    According to [1] it would be possible but not easily.
+
+    [1] http://serverfault.com/a/417946
+    """
+
+    def __init__(self):
+        tcp4 = ("tcp", socket.AF_INET, socket.SOCK_STREAM)
+        tcp6 = ("tcp6", socket.AF_INET6, socket.SOCK_STREAM)
+        udp4 = ("udp", socket.AF_INET, socket.SOCK_DGRAM)
+        udp6 = ("udp6", socket.AF_INET6, socket.SOCK_DGRAM)
+        unix = ("unix", socket.AF_UNIX, None)
+        self.tmap = {
+            "all": (tcp4, tcp6, udp4, udp6, unix),
+            "tcp": (tcp4, tcp6),
+            "tcp4": (tcp4,),
+            "tcp6": (tcp6,),
+            "udp": (udp4, udp6),
+            "udp4": (udp4,),
+            "udp6": (udp6,),
+            "unix": (unix,),
+            "inet": (tcp4, tcp6, udp4, udp6),
+            "inet4": (tcp4, udp4),
+            "inet6": (tcp6, udp6),
+        }
+        self._index = InodeIndex()
+
+    @staticmethod
+    def get_netns(netns=None):
+        """Return a (procfs_path, netdir, use_diag) tuple describing
+        where connections of a network namespace are read from, which
+        is the one of the current process unless 'netns' is a PID.
+        This is computed on every call and passed around explicitly
+        (never stored on the instance, which is shared by all
+        threads and by lazily consumed generators).
+        """
+        procfs_path = get_procfs_path()
+        if netns is None:
+            netdir = "%s/net" % procfs_path
+        else:
+            netdir = "%s/%s/net" % (procfs_path, netns)
+            if not os.path.exists(netdir):
+                raise NoSuchProcess(netns)
+        # NETLINK_SOCK_DIAG returns sockets belonging to the network
+        # namespace of the current process so we use it only if we're
+        # not reading an alternative /proc or another namespace.
+        use_diag = HAS_SOCK_DIAG and procfs_path == '/proc'
+        if use_diag and netns is not None:
+            try:
+                use_diag = netns_id(netns) == netns_id()
+            except OSError:
+                # no permission to inspect the namespace
+                use_diag = False
+        return (procfs_path, netdir, use_diag)
+
+    def get_proc_inodes(self, procfs_path, pid):
+        """Return a {inode: [(pid, fd), ...]} dict of the sockets
+        opened by 'pid'. This always re-reads all of its fds.
+        """
+        return self._index.scan_pid(procfs_path, pid)
+
+    def get_all_inodes(self, procfs_path):
+        """Return a {inode: [(pid, fd), ...]} mapping of all the
+        sockets opened by all processes.
+        """
+        return self._index.snapshot(procfs_path)
+
     def decode_address(self, addr, family):
         """Accept an "ip:port" address as displayed in /proc/net/*
         and convert it into a human readable form, like:
@@ -565,53 +985,84 @@ class Connections:
         # no end-points connected
         if not port:
             return ()
-        if PY3:
-            ip = ip.encode('ascii')
-        if family == socket.AF_INET:
-            # see: https://github.com/giampaolo/psutil/issues/201
-            if LITTLE_ENDIAN:
-                ip = socket.inet_ntop(family, base64.b16decode(ip)[::-1])
+        try:
+            return (_decode_ip(ip, family), port)
+        except ValueError:
+            # see: https://github.com/giampaolo/psutil/issues/623
+            if family == socket.AF_INET6 and not supports_ipv6():
+                raise _Ipv6UnsupportedError
             else:
-                ip = socket.inet_ntop(family, base64.b16decode(ip))
-        else:  # IPv6
-            # old version - let's keep it, just in case...
-            # ip = ip.decode('hex')
-            # return socket.inet_ntop(socket.AF_INET6,
-            #          ''.join(ip[i:i+4][::-1] for i in xrange(0, 16, 4)))
-            ip = base64.b16decode(ip)
-            try:
-                # see: https://github.com/giampaolo/psutil/issues/201
-                if LITTLE_ENDIAN:
-                    ip = socket.inet_ntop(
-                        socket.AF_INET6,
-                        struct.pack('>4I', *struct.unpack('<4I', ip)))
-                else:
-                    ip = socket.inet_ntop(
-                        socket.AF_INET6,
-                        struct.pack('<4I', *struct.unpack('<4I', ip)))
-            except ValueError:
-                # see: https://github.com/giampaolo/psutil/issues/623
-                if not supports_ipv6():
-                    raise _Ipv6UnsupportedError
-                else:
-                    raise
-        return (ip, port)
+                raise
+
+    @staticmethod
+    def pack_address(ip, family):
+        """Convert the IP address portion of an address as displayed
+        in /proc/net/* into packed form (network byte order).
+        """
+        ip = _unhexlify(ip)
+        # see: https://github.com/giampaolo/psutil/issues/201
+        if LITTLE_ENDIAN:
+            if family == socket.AF_INET:
+                ip = ip[::-1]
+            else:
+                # old version - let's keep it, just in case...
+                # ip = ip.decode('hex')
+                # return socket.inet_ntop(socket.AF_INET6,
+                #     ''.join(ip[i:i+4][::-1] for i in xrange(0, 16, 4)))
+                ip = _IPV6_WORDS_BE.pack(*_IPV6_WORDS_LE.unpack(ip))
+        return ip
+
+    def decode_packed_address(self, ip, port, family):
+        """Same as decode_address() but accepts an IP address in packed
+        form (network byte order) as returned by NETLINK_SOCK_DIAG and
+        a numeric port.
+        """
+        if not port:
+            return ()
+        try:
+            return (_inet_ntop(family, ip), port)
+        except ValueError:
+            if family == socket.AF_INET6 and not supports_ipv6():
+                raise _Ipv6UnsupportedError
+            raise
 
-    def process_inet(self, file, family, type_, inodes, filter_pid=None):
-        """Parse /proc/net/tcp* and /proc/net/udp* files."""
+    def process_inet(self, file, family, type_, inodes, filter_pid=None,
+                     statuses=None, lport=None, rport=None, extended=False):
+        """Parse /proc/net/tcp* and /proc/net/udp* files.
+        'statuses', 'lport' and 'rport' filters are applied against
+        the raw hex fields, before decoding addresses.
+        If 'extended' is True (inode, rqueue, wqueue, peer_inode,
+        peer_pid, rtt, rttvar, retransmits, cwnd) fields are added;
+        peers are unknown for inet sockets and RTT is not available
+        in /proc.
+        """
         if file.endswith('6') and not os.path.exists(file):
             # IPv6 not supported
             return
+        if statuses is not None and type_ == socket.SOCK_STREAM:
+            hex_statuses = frozenset(
+                [k for k, v in TCP_STATUSES.items() if v in statuses])
+        else:
+            hex_statuses = None
+        hex_lport = None if lport is None else ":%04X" % lport
+        hex_rport = None if rport is None else ":%04X" % rport
         with open_text(file, buffering=BIGGER_FILE_BUFFERING) as f:
             f.readline()  # skip the first line
             for lineno, line in enumerate(f, 1):
+                fields = line.split()
                 try:
-                    _, laddr, raddr, status, _, _, _, _, _, inode = \
-                        line.split()[:10]
+                    _, laddr, raddr, status, queues, _, retrans, _, _, \
+                        inode = fields[:10]
                 except ValueError:
                     raise RuntimeError(
                         "error while parsing %s; malformed line %s %r" % (
                             file, lineno, line))
+                if hex_statuses is not None and status not in hex_statuses:
+                    continue
+                if hex_lport is not None and not laddr.endswith(hex_lport):
+                    continue
+                if hex_rport is not None and not raddr.endswith(hex_rport):
+                    continue
                 if inode in inodes:
                     # # We assume inet sockets are unique, so we error
                     # # out if there are multiple references to the
@@ -634,10 +1085,86 @@ class Connections:
                         raddr = self.decode_address(raddr, family)
                     except _Ipv6UnsupportedError:
                         continue
-                    yield (fd, family, type_, laddr, raddr, status, pid)
+                    if extended:
+                        wqueue, rqueue = queues.split(':')
+                        if type_ != socket.SOCK_STREAM:
+                            retrans = cwnd = None
+                        else:
+                            retrans = int(retrans, 16)
+                            # TIME_WAIT and SYN_RECV lines are shorter
+                            cwnd = int(fields[15]) if len(fields) > 15 \
+                                else None
+                        yield (fd, family, type_, laddr, raddr, status, pid,
+                               int(inode), int(rqueue, 16), int(wqueue, 16),
+                               None, None, None, None, retrans, cwnd)
+                    else:
+                        yield (fd, family, type_, laddr, raddr, status, pid)
 
-    def process_unix(self, file, family, inodes, filter_pid=None):
-        """Parse /proc/net/unix files."""
+    def process_inet_packed(self, file, family):
+        """Parse /proc/net/tcp* and /proc/net/udp* files and yield
+        raw (laddr, lport, raddr, rport, state, inode, rqueue, wqueue,
+        info) rows with addresses in packed form, same as
+        NETLINK_SOCK_DIAG does. 'info' (tcp_info) is always None.
+        """
+        if file.endswith('6') and not os.path.exists(file):
+            # IPv6 not supported
+            return
+        pack_address = self.pack_address
+        with open_text(file, buffering=BIGGER_FILE_BUFFERING) as f:
+            f.readline()  # skip the first line
+            for lineno, line in enumerate(f, 1):
+                try:
+                    _, laddr, raddr, status, queues, _, _, _, _, inode = \
+                        line.split()[:10]
+                    lip, lport = laddr.split(':')
+                    rip, rport = raddr.split(':')
+                    wqueue, rqueue = queues.split(':')
+                except ValueError:
+                    raise RuntimeError(
+                        "error while parsing %s; malformed line %s %r" % (
+                            file, lineno, line))
+                yield (pack_address(lip, family), int(lport, 16),
+                       pack_address(rip, family), int(rport, 16),
+                       int(status, 16), inode, int(rqueue, 16),
+                       int(wqueue, 16), None)
+
+    def process_raw(self, netdir, use_diag, f, family, type_,
+                    states=TCPF_ALL, lport=None, rport=None):
+        """Return TCP or UDP sockets as raw (laddr, lport, raddr,
+        rport, state, inode, rqueue, wqueue, info) rows with addresses
+        in packed form, via
+        NETLINK_SOCK_DIAG if 'use_diag' is True, else by parsing
+        'netdir'/* files.
+        'states' is a bitmask of TCP states (1 << state); it is
+        ignored for UDP sockets.
+        """
+        if use_diag:
+            if type_ == socket.SOCK_STREAM:
+                protocol = socket.IPPROTO_TCP
+            else:
+                protocol = socket.IPPROTO_UDP
+                states = TCPF_ALL
+            try:
+                return cext.net_connections_inet(
+                    family, protocol, states,
+                    -1 if lport is None else lport,
+                    -1 if rport is None else rport, False)
+            except EnvironmentError:
+                pass
+        rows = self.process_inet_packed("%s/%s" % (netdir, f), family)
+        if type_ != socket.SOCK_STREAM or states == TCPF_ALL:
+            states = None
+        if states is None and lport is None and rport is None:
+            return rows
+        return (row for row in rows
+                if (states is None or states & (1 << row[4])) and
+                (lport is None or row[1] == lport) and
+                (rport is None or row[3] == rport))
+
+    def process_unix_raw(self, file):
+        """Parse /proc/net/unix files and yield raw (type, inode, path)
+        rows.
+        """
         with open_text(file, buffering=BIGGER_FILE_BUFFERING) as f:
             f.readline()  # skip the first line
             for line in f:
@@ -651,71 +1178,559 @@ class Connections:
                     raise RuntimeError(
                         "error while parsing %s; malformed line %r" % (
                             file, line))
+                if len(tokens) == 8:
+                    path = tokens[-1]
+                else:
+                    path = ""
+                yield (int(type_), inode, path)
+
+    def process_unix(self, file, family, inodes, filter_pid=None,
+                     extended=False):
+        """Parse /proc/net/unix files.
+        If 'extended' is True (inode, rqueue, wqueue, peer_inode,
+        peer_pid, rtt, rttvar, retransmits, cwnd) fields are added,
+        all of them being None except the inode since /proc/net/unix
+        does not provide them.
+        """
+        raddr = None
+        status = _common.CONN_NONE
+        for type_, inode, path in self.process_unix_raw(file):
+            if inode in inodes:
+                # With UNIX sockets we can have a single inode
+                # referencing many file descriptors.
+                pairs = inodes[inode]
+            else:
+                pairs = [(None, -1)]
+            for pid, fd in pairs:
+                if filter_pid is not None and filter_pid != pid:
+                    continue
+                if extended:
+                    yield (fd, family, type_, path, raddr, status, pid,
+                           int(inode), None, None, None, None, None, None,
+                           None, None)
+                else:
+                    yield (fd, family, type_, path, raddr, status, pid)
+
+    def process_diag(self, family, type_, inodes, filter_pid=None,
+                     statuses=None, lport=None, rport=None, extended=False,
+                     peers=None):
+        """Same as process_inet() and process_unix() but asks the
+        kernel for sockets via NETLINK_SOCK_DIAG, which returns them
+        as binary structs, instead of parsing /proc/net/* text files.
+        'statuses', 'lport' and 'rport' filters are applied by the
+        kernel (TCP states bitmask and inet_diag bytecode).
+        If 'extended' is True (inode, rqueue, wqueue, peer_inode,
+        peer_pid, rtt, rttvar, retransmits, cwnd) fields are added;
+        the PID of UNIX sockets' peers is looked up in 'peers' mapping
+        and TCP metrics are requested in bulk (INET_DIAG_INFO).
+        Return None if sock_diag is not usable (e.g. the inet_diag
+        kernel module is not available), in which case the caller is
+        supposed to fall back on parsing /proc/net/*.
+        """
+        states = TCPF_ALL
+        if statuses is not None and type_ == socket.SOCK_STREAM:
+            states = tcp_states_mask(statuses)
+            if not states:
+                return iter([])
+        lport = -1 if lport is None else lport
+        rport = -1 if rport is None else rport
+        try:
+            if family == socket.AF_UNIX:
+                rows = cext.net_connections_unix()
+            elif type_ == socket.SOCK_STREAM:
+                rows = cext.net_connections_inet(
+                    family, socket.IPPROTO_TCP, states, lport, rport,
+                    extended)
+            else:
+                rows = cext.net_connections_inet(
+                    family, socket.IPPROTO_UDP, states, lport, rport, False)
+        except EnvironmentError:
+            return None
+
+        def process_inet_rows():
+            for laddr, lport, raddr, rport, state, inode, rqueue, wqueue, \
+                    info in rows:
+                ino = inode
+                inode = str(inode)
+                if inode in inodes:
+                    pid, fd = inodes[inode][0]
+                else:
+                    pid, fd = None, -1
+                if filter_pid is not None and filter_pid != pid:
+                    continue
+                if type_ == socket.SOCK_STREAM:
+                    status = TCP_STATUSES_DIAG[state]
+                else:
+                    status = _common.CONN_NONE
+                try:
+                    laddr = self.decode_packed_address(laddr, lport, family)
+                    raddr = self.decode_packed_address(raddr, rport, family)
+                except _Ipv6UnsupportedError:
+                    continue
+                if extended:
+                    if info is None:
+                        rtt = rttvar = retrans = cwnd = None
+                    else:
+                        rtt, rttvar, retrans, cwnd = info
+                        # usecs -> millisecs
+                        rtt /= 1000.0
+                        rttvar /= 1000.0
+                    yield (fd, family, type_, laddr, raddr, status, pid,
+                           ino, rqueue, wqueue, None, None, rtt, rttvar,
+                           retrans, cwnd)
+                else:
+                    yield (fd, family, type_, laddr, raddr, status, pid)
+
+        def process_unix_rows():
+            for type_, _, ino, path, peer, rqueue, wqueue in rows:
+                inode = str(ino)
                 if inode in inodes:
-                    # With UNIX sockets we can have a single inode
-                    # referencing many file descriptors.
                     pairs = inodes[inode]
                 else:
                     pairs = [(None, -1)]
+                if extended:
+                    if not peer:
+                        peer = peer_pid = None
+                    elif str(peer) in peers:
+                        peer_pid = peers[str(peer)][0][0]
+                    else:
+                        peer_pid = None
                 for pid, fd in pairs:
                     if filter_pid is not None and filter_pid != pid:
                         continue
+                    if extended:
+                        yield (fd, family, type_, path, None,
+                               _common.CONN_NONE, pid, ino, rqueue, wqueue,
+                               peer, peer_pid, None, None, None, None)
                     else:
-                        if len(tokens) == 8:
-                            path = tokens[-1]
-                        else:
-                            path = ""
-                        type_ = int(type_)
-                        raddr = None
-                        status = _common.CONN_NONE
-                        yield (fd, family, type_, path, raddr, status, pid)
-
-    def retrieve(self, kind, pid=None):
+                        yield (fd, family, type_, path, None,
+                               _common.CONN_NONE, pid)
+
+        if family == socket.AF_UNIX:
+            return process_unix_rows()
+        return process_inet_rows()
+
+    def iter_raw(self, kind, pid=None, status=None, lport=None,
+                 rport=None, netns=None, extended=False):
+        """Return a generator yielding connections of the given kind as
+        (fd, family, type, laddr, raddr, status, pid) tuples as they
+        are read, system-wide or belonging to 'pid'.
+        Connections can be filtered by 'status' (a CONN_* constant or
+        a sequence of them), local port ('lport') and remote port
+        ('rport'). Filters are applied while reading connections,
+        before decoding addresses.
+        If 'netns' is a PID, connections of the network namespace of
+        that process are returned.
+        If 'extended' is True (inode, rqueue, wqueue, peer_inode,
+        peer_pid, rtt, rttvar, retransmits, cwnd) fields are appended
+        to each tuple.
+        The same connection may be yielded more than once.
+        """
         if kind not in self.tmap:
             raise ValueError("invalid %r kind argument; choose between %s"
                              % (kind, ', '.join([repr(x) for x in self.tmap])))
-        self._procfs_path = get_procfs_path()
+        statuses = _common.conn_statuses(status)
+        # everything the generator below needs is bound to local
+        # names now, as it may be consumed much later
+        procfs_path, netdir, use_diag = self.get_netns(netns)
         if pid is not None:
-            inodes = self.get_proc_inodes(pid)
+            inodes = self.get_proc_inodes(procfs_path, pid)
             if not inodes:
                 # no connections for this process
-                return []
+                return iter([])
         else:
-            inodes = self.get_all_inodes()
+            inodes = self.get_all_inodes(procfs_path)
+        peers = None
+        if extended and use_diag:
+            # the peer of a UNIX socket may belong to any process
+            peers = inodes if pid is None else \
+                self.get_all_inodes(procfs_path)
+
+        def iterate():
+            for f, family, type_ in self.tmap[kind]:
+                if type_ != socket.SOCK_STREAM:
+                    # UDP and UNIX sockets have no status
+                    if statuses is not None and \
+                            _common.CONN_NONE not in statuses:
+                        continue
+                    # ...and UNIX sockets have no ports
+                    if family == socket.AF_UNIX and \
+                            (lport is not None or rport is not None):
+                        continue
+                ls = None
+                if use_diag:
+                    ls = self.process_diag(
+                        family, type_, inodes, filter_pid=pid,
+                        statuses=statuses, lport=lport, rport=rport,
+                        extended=extended, peers=peers)
+                if ls is None:
+                    path = "%s/%s" % (netdir, f)
+                    if family in (socket.AF_INET, socket.AF_INET6):
+                        ls = self.process_inet(
+                            path, family, type_, inodes, filter_pid=pid,
+                            statuses=statuses, lport=lport, rport=rport,
+                            extended=extended)
+                    else:
+                        ls = self.process_unix(
+                            path, family, inodes, filter_pid=pid,
+                            extended=extended)
+                for conn in ls:
+                    yield conn
+
+        return iterate()
+
+    def retrieve(self, kind, pid=None):
+        """Return a list of unique per-process connections."""
         ret = set()
+        for conn in self.iter_raw(kind, pid):
+            ret.add(_common.pconn(*conn[:-1]))
+        return list(ret)
+
+    def process_summary(self, netdir, use_diag, f, family, type_):
+        """Yield (type, status, lport, rport, inode) rows for the
+        given socket family and type without decoding addresses.
+        Ports of UNIX sockets are None.
+        """
+        if family != socket.AF_UNIX:
+            rows = self.process_raw(netdir, use_diag, f, family, type_)
+            for _, lport, _, rport, state, inode, _, _, _ in rows:
+                if type_ == socket.SOCK_STREAM:
+                    status = TCP_STATUSES_DIAG[state]
+                else:
+                    status = _common.CONN_NONE
+                yield (type_, status, lport, rport, str(inode))
+            return
+        if use_diag:
+            try:
+                rows = cext.net_connections_unix()
+            except EnvironmentError:
+                pass
+            else:
+                for row in rows:
+                    yield (row[0], _common.CONN_NONE, None, None,
+                           str(row[2]))
+                return
+        for type_, inode, _ in self.process_unix_raw("%s/%s" % (netdir, f)):
+            yield (type_, _common.CONN_NONE, None, None, inode)
+
+    def summary(self, kind, group_by):
+        """Count sockets of the given kind grouped by one or more
+        'group_by' fields without decoding addresses or creating
+        connection namedtuples. Processes' fds are not looked at
+        unless grouping by 'pid'.
+        """
+        if kind not in self.tmap:
+            raise ValueError("invalid %r kind argument; choose between %s"
+                             % (kind, ', '.join([repr(x) for x in self.tmap])))
+        fields = _common.summary_fields(group_by)
+        procfs_path, netdir, use_diag = self.get_netns()
+        if 'pid' in fields:
+            inodes = self.get_all_inodes(procfs_path)
+        else:
+            inodes = {}
+        # rows built below follow the order of conn_summary_fields
+        idxs = [_common.conn_summary_fields.index(x) for x in fields]
+        scalar = isinstance(group_by, basestring)
+        no_owner = (None, )
+        ret = {}
+        for f, family, type_ in self.tmap[kind]:
+            for type_, status, lport, rport, inode in \
+                    self.process_summary(netdir, use_diag, f, family, type_):
+                if inode not in inodes:
+                    owners = no_owner
+                elif family != socket.AF_UNIX:
+                    # We assume inet sockets are unique (see
+                    # process_inet()).
+                    owners = (inodes[inode][0][0], )
+                else:
+                    # UNIX sockets may be shared by many processes, in
+                    # which case they are counted once per process.
+                    owners = set([x[0] for x in inodes[inode]])
+                for pid in owners:
+                    row = (family, type_, status, lport, rport, pid)
+                    if scalar:
+                        key = row[idxs[0]]
+                    else:
+                        key = tuple([row[i] for i in idxs])
+                    ret[key] = ret.get(key, 0) + 1
+        return ret
+
+    def find_pid(self, port, kind, status):
+        """Return the PID of the process owning a TCP or UDP socket
+        bound to local 'port', or None. Only matching sockets are
+        retrieved, then processes are looked at until the owner of
+        one of them is found.
+        """
+        if kind not in self.tmap:
+            raise ValueError("invalid %r kind argument; choose between %s"
+                             % (kind, ', '.join([repr(x) for x in self.tmap])))
+        if socket.AF_UNIX in [x[1] for x in self.tmap[kind]]:
+            raise ValueError("UNIX sockets are not supported")
+        statuses = _common.conn_statuses(status)
+        procfs_path, netdir, use_diag = self.get_netns()
+        inodes = set()
         for f, family, type_ in self.tmap[kind]:
-            if family in (socket.AF_INET, socket.AF_INET6):
-                ls = self.process_inet(
-                    "%s/net/%s" % (self._procfs_path, f),
-                    family, type_, inodes, filter_pid=pid)
+            if type_ != socket.SOCK_STREAM:
+                # UDP sockets have no status
+                if statuses is not None and \
+                        _common.CONN_NONE not in statuses:
+                    continue
+                states = TCPF_ALL
+            elif statuses is not None:
+                states = tcp_states_mask(statuses)
+                if not states:
+                    continue
             else:
-                ls = self.process_unix(
-                    "%s/net/%s" % (self._procfs_path, f),
-                    family, inodes, filter_pid=pid)
-            for fd, family, type_, laddr, raddr, status, bound_pid in ls:
-                if pid:
-                    conn = _common.pconn(fd, family, type_, laddr, raddr,
-                                         status)
+                states = TCPF_ALL
+            for row in self.process_raw(netdir, use_diag, f, family, type_,
+                                        states, lport=port):
+                inode = str(row[5])
+                if inode != '0':
+                    inodes.add(inode)
+        if not inodes:
+            return None
+        return self._index.find_owner(procfs_path, inodes)
+
+    def table(self, kind):
+        """Return system-wide TCP and UDP connections as a
+        ConnectionTable instance. Addresses are never decoded.
+        """
+        if kind not in self.tmap:
+            raise ValueError("invalid %r kind argument; choose between %s"
+                             % (kind, ', '.join([repr(x) for x in self.tmap])))
+        if socket.AF_UNIX in [x[1] for x in self.tmap[kind]]:
+            raise ValueError("UNIX sockets are not supported")
+        procfs_path, netdir, use_diag = self.get_netns()
+        inodes = self.get_all_inodes(procfs_path)
+        table = ConnectionTable()
+        # bind methods to local names as this is the hot path
+        add_family = table.family.append
+        add_type = table.type.append
+        add_status = table.status.append
+        add_lport = table.lport.append
+        add_rport = table.rport.append
+        add_inode = table.inode.append
+        add_pid = table.pid.append
+        add_fd = table.fd.append
+        laddrs = table.laddr
+        raddrs = table.raddr
+        v4mapped = b('\x00') * 10 + b('\xff\xff')
+        for f, family, type_ in self.tmap[kind]:
+            rows = self.process_raw(netdir, use_diag, f, family, type_)
+            for laddr, lport, raddr, rport, state, inode, _, _, _ in rows:
+                inode = str(inode)
+                if inode in inodes:
+                    pid, fd = inodes[inode][0]
                 else:
-                    conn = _common.sconn(fd, family, type_, laddr, raddr,
-                                         status, bound_pid)
-                ret.add(conn)
-        return list(ret)
+                    pid, fd = -1, -1
+                if type_ != socket.SOCK_STREAM:
+                    state = 0
+                elif state == 12:
+                    # TCP_NEW_SYN_RECV
+                    state = 3
+                if family == socket.AF_INET:
+                    laddr = v4mapped + laddr
+                    raddr = v4mapped + raddr
+                add_family(family)
+                add_type(type_)
+                add_status(state)
+                laddrs.extend(laddr)
+                add_lport(lport)
+                raddrs.extend(raddr)
+                add_rport(rport)
+                add_inode(int(inode))
+                add_pid(pid)
+                add_fd(fd)
+        return table
+
+
+class ConnectionTable(object):
+    """System-wide TCP and UDP connections stored column-wise as
+    parallel arrays, one item per connection:
+
+     - family, type: socket.AF_* and socket.SOCK_* constants
+     - status: the numeric TCP state, 0 for UDP sockets (see
+       'statuses' attribute for the mapping with CONN_* constants)
+     - laddr, raddr: bytearrays of 16-byte IP addresses in packed
+       form; IPv4 addresses are stored as IPv4-mapped IPv6
+       addresses (::ffff:a.b.c.d)
+     - lport, rport: port numbers (0 = none)
+     - inode: the socket inode
+     - pid, fd: the owner process and file descriptor, -1 if unknown
+    """
+
+    _columns = (('family', 'B'), ('type', 'B'), ('status', 'B'),
+                ('lport', 'H'), ('rport', 'H'), ('inode', 'L'),
+                ('pid', 'l'), ('fd', 'l'))
+    statuses = dict([(k, v) for k, v in TCP_STATUSES_DIAG.items()
+                     if k != 12])
+    statuses[0] = _common.CONN_NONE
+
+    def __init__(self):
+        for name, typecode in self._columns:
+            setattr(self, name, array.array(typecode))
+        self.laddr = bytearray()
+        self.raddr = bytearray()
+
+    def __len__(self):
+        return len(self.family)
+
+    def __repr__(self):
+        return "<%s(%s connections)>" % (self.__class__.__name__, len(self))
+
+    def as_numpy(self):
+        """Return columns as a dict of NumPy arrays sharing memory
+        with this table. 'laddr' and 'raddr' are (n, 16) uint8
+        arrays. Requires NumPy.
+        """
+        import numpy
+        ret = {}
+        for name, typecode in self._columns:
+            col = getattr(self, name)
+            if col:
+                ret[name] = numpy.frombuffer(col, dtype=typecode)
+            else:
+                ret[name] = numpy.zeros(0, dtype=typecode)
+        for name in ('laddr', 'raddr'):
+            col = getattr(self, name)
+            if col:
+                ret[name] = numpy.frombuffer(col, dtype=numpy.uint8)
+            else:
+                ret[name] = numpy.zeros(0, dtype=numpy.uint8)
+            ret[name] = ret[name].reshape(-1, 16)
+        return ret
 
 
 _connections = Connections()
 
 
-def net_connections(kind='inet'):
+def iter_connections(kind='inet', status=None, lport=None, rport=None,
+                     pid=None, unique=False, netns=None, extended=False):
+    """Return a generator yielding system-wide connections as they
+    are read. Duplicates are discarded only if 'unique' is True.
+    """
+    try:
+        conns = _connections.iter_raw(kind, pid, status, lport, rport,
+                                      netns, extended)
+    except EnvironmentError as err:
+        # 'pid' is gone or its fds can't be read: as on other platforms
+        # (and as with system-wide connections) it owns no connections
+        if pid is None or err.errno not in (
+                errno.ENOENT, errno.ESRCH, errno.EPERM, errno.EACCES):
+            raise
+        conns = iter([])
+    ntuple = sconnx if extended else _common.sconn
+
+    def iterate():
+        seen = set()
+        for conn in conns:
+            conn = ntuple(*conn)
+            if unique:
+                if conn in seen:
+                    continue
+                seen.add(conn)
+            yield conn
+
+    return iterate()
+
+
+def net_connections_summary(kind='inet', group_by=('pid', 'status')):
+    """Return the number of connections grouped by 'group_by'."""
+    return _connections.summary(kind, group_by)
+
+
+def pid_for_port(port, kind='tcp', status=_common.CONN_LISTEN):
+    """Return the PID of the process owning local 'port'."""
+    return _connections.find_pid(port, kind, status)
+
+
+def connection_table(kind='inet'):
+    """Return system-wide TCP and UDP connections as a
+    ConnectionTable of parallel arrays.
+    """
+    return _connections.table(kind)
+
+
+def net_connections(kind='inet', status=None, lport=None, rport=None,
+                    pid=None, netns=None, extended=False):
     """Return system-wide open connections."""
-    return _connections.retrieve(kind)
+    return list(iter_connections(kind, status, lport, rport, pid,
+                                 unique=True, netns=netns,
+                                 extended=extended))
+
+
+def netns_id(pid=None):
+    """Return the inode number identifying the network namespace of
+    'pid' (default: the current process).
+    """
+    return os.stat("%s/%s/ns/net" % (
+        get_procfs_path(), "self" if pid is None else pid)).st_ino
+
+
+def net_namespaces():
+    """Return a {netns_id: [pid, ...]} dict of the network
+    namespaces processes belong to.
+    """
+    procfs_path = get_procfs_path()
+    ret = {}
+    for pid in pids():
+        try:
+            ino = os.stat("%s/%s/ns/net" % (procfs_path, pid)).st_ino
+        except OSError as err:
+            # we need to be able to ptrace() the process
+            if err.errno in (
+                    errno.ENOENT, errno.ESRCH, errno.EPERM, errno.EACCES):
+                continue
+            raise
+        ret.setdefault(ino, []).append(pid)
+    return ret
 
 
-def net_io_counters():
+def net_if_links():
+    """Return flags, MTU and 64-bit stats of all network interfaces
+    as a {name: snetlink} dict, retrieved with a single netlink
+    RTM_GETLINK dump.
+    """
+    ret = {}
+    for name, flags, mtu, stats in cext.net_if_links():
+        ret[name] = snetlink(bool(flags & IFF_UP), mtu, *stats)
+    return ret
+
+
+def net_io_counters(netns=None):
     """Return network I/O statistics for every network interface
     installed on the system as a dict of raw tuples.
+    If 'netns' is a PID interfaces of its network namespace are
+    returned.
     """
-    with open_text("%s/net/dev" % get_procfs_path()) as f:
+    if netns is None and HAS_NET_IF_LINKS and \
+            get_procfs_path() == '/proc':
+        # A netlink dump is a lot faster than parsing /proc/net/dev
+        # and provides the same (but 64-bit) counters. A custom
+        # PROCFS_PATH means the user wants to read that instead.
+        try:
+            links = cext.net_if_links()
+        except EnvironmentError:
+            pass
+        else:
+            retdict = {}
+            for name, _, _, s in links:
+                # same as /proc/net/dev, which also adds
+                # rx_missed_errors to the incoming drops
+                retdict[name] = (s[3], s[2], s[1], s[0], s[4], s[5],
+                                 s[6] + s[15], s[7])
+            return retdict
+    if netns is None:
+        path = "%s/net/dev" % get_procfs_path()
+    else:
+        path = "%s/%s/net/dev" % (get_procfs_path(), netns)
+    try:
+        f = open_text(path)
+    except EnvironmentError as err:
+        if netns is not None and err.errno in (errno.ENOENT, errno.ESRCH):
+            raise NoSuchProcess(netns)
+        raise
+    with f:
         lines = f.readlines()
     retdict = {}
     for line in lines[2:]:
@@ -736,18 +1751,141 @@ def net_io_counters():
     return retdict
 
 
-def net_if_stats():
-    """Get NIC stats (isup, duplex, speed, mtu)."""
+class NetlinkCache:
+    """Cache the results of network interfaces related functions
+    until the kernel signals that something changed.
+    A non-blocking netlink socket subscribed to 'groups' (link and
+    address change notifications) is drained on every access: if
+    any message arrived (or some were lost) the cache is cleared.
+    If the socket cannot be used nothing is cached.
+    """
+
+    def __init__(self, groups):
+        self._groups = groups
+        self._sock = None
+        self._pid = None
+        self._lock = threading.Lock()
+        self._cache = {}
+
+    def _open(self):
+        self.close()
+        try:
+            sock = socket.socket(socket.AF_NETLINK, socket.SOCK_RAW,
+                                 NETLINK_ROUTE)
+        except (AttributeError, socket.error):
+            return
+        try:
+            sock.bind((0, self._groups))
+            sock.setblocking(False)
+        except socket.error:
+            sock.close()
+            return
+        self._sock = sock
+        self._pid = os.getpid()
+
+    def close(self):
+        if self._sock is not None:
+            self._sock.close()
+            self._sock = None
+
+    def _changed(self):
+        if self._sock is None or self._pid != os.getpid():
+            # first call, previous error or we were forked (the
+            # socket is shared with the parent)
+            self._open()
+            return True
+        changed = False
+        while True:
+            try:
+                data = self._sock.recv(65536)
+            except socket.error as err:
+                if err.errno in (errno.EAGAIN, errno.EWOULDBLOCK):
+                    break
+                if err.errno == errno.ENOBUFS:
+                    # notifications were lost
+                    changed = True
+                    continue
+                self.close()
+                return True
+            if not data:
+                break
+            changed = True
+        return changed
+
+    def get(self, fun):
+        """Return the cached result of 'fun', calling it only if a
+        change notification arrived since it was cached.
+        """
+        with self._lock:
+            if self._changed() or self._sock is None:
+                self._cache.clear()
+            try:
+                return self._cache[fun]
+            except KeyError:
+                ret = self._cache[fun] = fun()
+                return ret
+
+
+net_if_cache = NetlinkCache(
+    RTMGRP_LINK | RTMGRP_IPV4_IFADDR | RTMGRP_IPV6_IFADDR)
+
+
+# {name: (isup, timestamp, duplex, speed)}
+_nic_speed_cache = {}
+_nic_speed_cache_lock = threading.Lock()
+
+
+def net_if_stats(cache_ttl=None):
+    """Get NIC stats (isup, duplex, speed, mtu).
+    Names, status and MTU of all NICs are retrieved with a single
+    netlink dump; duplex and speed with one ioctl() per NIC, all
+    sharing the same socket. If 'cache_ttl' is a number, duplex and
+    speed of NICs whose status did not change are reused for that
+    many seconds.
+    """
     duplex_map = {cext.DUPLEX_FULL: NIC_DUPLEX_FULL,
                   cext.DUPLEX_HALF: NIC_DUPLEX_HALF,
                   cext.DUPLEX_UNKNOWN: NIC_DUPLEX_UNKNOWN}
-    names = net_io_counters().keys()
-    ret = {}
-    for name in names:
-        isup, duplex, speed, mtu = cext.net_if_stats(name)
-        duplex = duplex_map[duplex]
-        ret[name] = _common.snicstats(isup, duplex, speed, mtu)
-    return ret
+    links = None
+    if HAS_NET_IF_LINKS and get_procfs_path() == '/proc':
+        try:
+            links = cext.net_if_links()
+        except EnvironmentError:
+            pass
+    if links is None:
+        ret = {}
+        for name in net_io_counters().keys():
+            isup, duplex, speed, mtu = cext.net_if_stats(name)
+            duplex = duplex_map[duplex]
+            ret[name] = _common.snicstats(isup, duplex, speed, mtu)
+        return ret
+
+    nics = [(name, bool(flags & IFF_UP), mtu) for name, flags, mtu, _ in
+            links]
+    cache = _nic_speed_cache
+    with _nic_speed_cache_lock:
+        now = _timer()
+        stale = [name for name, isup, _ in nics
+                 if cache_ttl is None or name not in cache or
+                 cache[name][0] != isup or now - cache[name][1] >= cache_ttl]
+        if stale:
+            for name, value in zip(stale, cext.net_if_duplex_speed(stale)):
+                if value is None:
+                    # NIC is gone
+                    cache.pop(name, None)
+                else:
+                    cache[name] = (None, now) + tuple(value)
+        ret = {}
+        for name, isup, mtu in nics:
+            if name in cache:
+                _, ts, duplex, speed = cache[name]
+                cache[name] = (isup, ts, duplex, speed)
+                ret[name] = _common.snicstats(isup, duplex_map[duplex], speed,
+                                              mtu)
+        for name in list(cache):
+            if name not in ret:
+                del cache[name]
+        return ret
 
 
 net_if_addrs = cext_posix.net_if_addrs
@@ -755,37 +1893,199 @@ net_if_addrs = cext_posix.net_if_addrs
 
 # --- disks
 
-def disk_io_counters():
-    """Return disk I/O statistics for every disk installed on the
-    system as a dict of raw tuples.
+# {(procfs_path, names listed in /proc/diskstats): partitions}
+_partitions_cache = {}
+# {block devices listed in /sys/class/block: topology}
+_topology_cache = {}
+
+
+def is_partition(name):
+    """Return whether block device 'name' is a partition. If it's
+    not listed in /sys/class/block fall back on guessing it from
+    the name (e.g. 'sda1').
     """
-    # determine partitions we want to look for
-    def get_partitions():
-        partitions = []
-        with open_text("%s/partitions" % get_procfs_path()) as f:
-            lines = f.readlines()[2:]
-        for line in reversed(lines):
-            _, _, _, name = line.split()
-            if name[-1].isdigit():
-                # we're dealing with a partition (e.g. 'sda1'); 'sda' will
-                # also be around but we want to omit it
+    path = "%s/%s" % (BLOCK_SYSFS_PATH, name)
+    if os.path.isdir(path):
+        return os.path.exists(path + "/partition")
+    return name[-1].isdigit()
+
+
+def get_partitions(procfs_path, names):
+    """Return the set of partitions and disks with no partitions
+    we want to report I/O counters for, as listed in
+    /proc/partitions. The result is cached until a disk appears in
+    or disappears from 'names' (the devices listed in
+    /proc/diskstats).
+    """
+    key = (procfs_path, names)
+    try:
+        return _partitions_cache[key]
+    except KeyError:
+        pass
+    partitions = []
+    with open_text("%s/partitions" % procfs_path) as f:
+        lines = f.readlines()[2:]
+    for line in reversed(lines):
+        _, _, _, name = line.split()
+        if is_partition(name):
+            # we're dealing with a partition (e.g. 'sda1'); 'sda' will
+            # also be around but we want to omit it
+            partitions.append(name)
+        else:
+            if not partitions or not partitions[-1].startswith(name):
+                # we're dealing with a disk entity for which no
+                # partitions have been defined (e.g. 'sda' but
+                # 'sda1' was not around), see:
+                # https://github.com/giampaolo/psutil/issues/338
                 partitions.append(name)
-            else:
-                if not partitions or not partitions[-1].startswith(name):
-                    # we're dealing with a disk entity for which no
-                    # partitions have been defined (e.g. 'sda' but
-                    # 'sda1' was not around), see:
-                    # https://github.com/giampaolo/psutil/issues/338
-                    partitions.append(name)
-        return partitions
+    _partitions_cache.clear()
+    ret = _partitions_cache[key] = frozenset(partitions)
+    return ret
+
+
+def _listdir(path):
+    try:
+        return os.listdir(path)
+    except EnvironmentError as err:
+        if err.errno in (errno.ENOENT, errno.ENOTDIR):
+            return []
+        raise
+
+
+def _read_sysfs(path, default=''):
+    try:
+        with open_text(path) as f:
+            return f.read().strip()
+    except EnvironmentError as err:
+        if err.errno in (errno.ENOENT, errno.ENOTDIR):
+            return default
+        raise
+
+
+def disk_topology():
+    """Return a dict mapping the kernel name of every block device
+    to a (name, type, parents, children) namedtuple. The result is
+    cached until block devices are added or removed.
+    """
+    names = frozenset(_listdir(BLOCK_SYSFS_PATH))
+    try:
+        return dict(_topology_cache[names])
+    except KeyError:
+        pass
+    # md arrays are usually given a name via a /dev/md/{name} symlink
+    md_names = {}
+    for mdname in _listdir("/dev/md"):
+        try:
+            md_names[os.path.basename(readlink("/dev/md/" + mdname))] = mdname
+        except OSError:
+            pass
+
+    info = {}
+    for kname in names:
+        path = "%s/%s" % (BLOCK_SYSFS_PATH, kname)
+        name = kname
+        parents = _listdir(path + "/slaves")
+        children = _listdir(path + "/holders")
+        if os.path.exists(path + "/partition"):
+            kind = 'part'
+            parents.append(
+                os.path.basename(os.path.dirname(os.path.realpath(path))))
+        elif os.path.isdir(path + "/dm"):
+            name = _read_sysfs(path + "/dm/name") or kname
+            # e.g. "LVM-...", "CRYPT-LUKS2-...", "mpath-..."
+            uuid = _read_sysfs(path + "/dm/uuid")
+            kind = uuid.split('-')[0].lower() if '-' in uuid else 'dm'
+        elif os.path.isdir(path + "/md"):
+            name = md_names.get(kname, kname)
+            kind = _read_sysfs(path + "/md/level") or 'md'
+        else:
+            kind = 'disk'
+        info[kname] = [name, kind, parents, children]
+    # partitions are not listed among the holders of their disk
+    for kname, (_, kind, parents, _) in info.items():
+        if kind == 'part':
+            for parent in parents:
+                if parent in info and kname not in info[parent][3]:
+                    info[parent][3].append(kname)
+
+    ret = {}
+    for kname, (name, kind, parents, children) in info.items():
+        ret[kname] = sdisktopo(name, kind, tuple(sorted(parents)),
+                               tuple(sorted(children)))
+    _topology_cache.clear()
+    _topology_cache[names] = ret
+    return dict(ret)
+
+
+def _parse_disk_stats(values):
+    """Parse the statistics of a disk as found in /proc/diskstats
+    (after the disk name) or in /sys/class/block/<dev>/stat.
+    Return None if the format is not recognized.
+    """
+    # See:
+    # https://www.kernel.org/doc/Documentation/iostats.txt
+    # https://www.kernel.org/doc/Documentation/ABI/testing/procfs-diskstats
+    nvalues = len(values)
+    if nvalues == 4:
+        # Linux 2.6+, line referring to a partition
+        reads, rbytes, writes, wbytes = map(int, values)
+        return (reads, writes, rbytes * SECTOR_SIZE, wbytes * SECTOR_SIZE,
+                0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0)
+    if nvalues not in (11, 15, 17):
+        return None
+    values = [int(x) for x in values]
+    (reads, reads_merged, rbytes, rtime, writes, writes_merged,
+        wbytes, wtime, in_flight, busy_time, weighted_time) = values[:11]
+    if nvalues >= 15:
+        # Linux 4.18+
+        discards, discards_merged, dbytes, dtime = values[11:15]
+    else:
+        discards = discards_merged = dbytes = dtime = 0
+    if nvalues == 17:
+        # Linux 5.5+
+        flushes, ftime = values[15:17]
+    else:
+        flushes = ftime = 0
+    return (reads, writes, rbytes * SECTOR_SIZE, wbytes * SECTOR_SIZE,
+            rtime, wtime, reads_merged, writes_merged, busy_time,
+            in_flight, weighted_time, discards, discards_merged,
+            dbytes * SECTOR_SIZE, dtime, flushes, ftime)
+
 
+def disk_io_counters(disks=None):
+    """Return disk I/O statistics for every disk installed on the
+    system as a dict of raw tuples.
+    If 'disks' is a list of disk names only read those from
+    /sys/class/block/<disk>/stat instead; missing disks are
+    skipped.
+    """
     retdict = {}
-    partitions = get_partitions()
-    with open_text("%s/diskstats" % get_procfs_path()) as f:
+    if disks is not None:
+        for name in disks:
+            try:
+                with open_binary("%s/%s/stat" % (BLOCK_SYSFS_PATH, name)) as f:
+                    values = f.read().split()
+            except EnvironmentError as err:
+                if err.errno in (errno.ENOENT, errno.ENOTDIR):
+                    continue
+                raise
+            ret = _parse_disk_stats(values)
+            if ret is None:
+                raise ValueError("not sure how to interpret %r" % values)
+            retdict[name] = ret
+        return retdict
+
+    procfs_path = get_procfs_path()
+    with open_text("%s/diskstats" % procfs_path) as f:
         lines = f.readlines()
-    for line in lines:
+    rows = [line.split() for line in lines]
+    # the disk name is the 4th field on Linux 2.4, else the 3rd
+    names = tuple([fields[3] if len(fields) == 15 else fields[2]
+                   for fields in rows])
+    partitions = get_partitions(procfs_path, names)
+    for line, fields, name in zip(lines, rows, names):
         # OK, this is a bit confusing. The format of /proc/diskstats can
-        # have 3 variations.
+        # have several variations.
         # On Linux 2.4 each line has always 15 fields, e.g.:
         # "3     0   8 hda 8 8 8 8 8 8 8 8 8 8 8"
         # On Linux 2.6+ each line *usually* has 14 fields, and the disk
@@ -794,42 +2094,160 @@ def disk_io_counters():
         # ...unless (Linux 2.6) the line refers to a partition instead
         # of a disk, in which case the line has less fields (7):
         # "3    1   hda1 8 8 8 8"
-        # See:
-        # https://www.kernel.org/doc/Documentation/iostats.txt
-        # https://www.kernel.org/doc/Documentation/ABI/testing/procfs-diskstats
-        fields = line.split()
-        fields_len = len(fields)
-        if fields_len == 15:
+        # Linux 4.18+ adds 4 discard fields (18 fields) and Linux 5.5+
+        # 2 more flush fields (20 fields).
+        if name not in partitions:
+            continue
+        if len(fields) == 15:
             # Linux 2.4
-            name = fields[3]
-            reads = int(fields[2])
-            (reads_merged, rbytes, rtime, writes, writes_merged,
-                wbytes, wtime, _, busy_time, _) = map(int, fields[4:14])
-        elif fields_len == 14:
-            # Linux 2.6+, line referring to a disk
-            name = fields[2]
-            (reads, reads_merged, rbytes, rtime, writes, writes_merged,
-                wbytes, wtime, _, busy_time, _) = map(int, fields[3:14])
-        elif fields_len == 7:
-            # Linux 2.6+, line referring to a partition
-            name = fields[2]
-            reads, rbytes, writes, wbytes = map(int, fields[3:])
-            rtime = wtime = reads_merged = writes_merged = busy_time = 0
+            ret = _parse_disk_stats([fields[2]] + fields[4:14])
         else:
+            ret = _parse_disk_stats(fields[3:])
+        if ret is None:
             raise ValueError("not sure how to interpret line %r" % line)
+        retdict[name] = ret
+    return retdict
+
 
-        if name in partitions:
-            rbytes = rbytes * SECTOR_SIZE
-            wbytes = wbytes * SECTOR_SIZE
-            retdict[name] = (reads, writes, rbytes, wbytes, rtime, wtime,
-                             reads_merged, writes_merged, busy_time)
+def disk_io_stats(rates, counters):
+    """Given the per-second rates of disk_io_counters(perdisk=True)
+    and the counters they were computed from, return iostat-like
+    metrics for every disk as a dict of namedtuples.
+    """
+    retdict = {}
+    for name, rate in rates.items():
+        r_await = rate.read_time / rate.read_count if rate.read_count else 0.0
+        w_await = \
+            rate.write_time / rate.write_count if rate.write_count else 0.0
+        # time counters are in milliseconds, rates are per second
+        avgqu_sz = rate.weighted_time / 1000.0
+        util = min(rate.busy_time / 10.0, 100.0)
+        retdict[name] = sdiskstats(
+            rate.read_count, rate.write_count, rate.read_bytes,
+            rate.write_bytes, r_await, w_await, avgqu_sz, util,
+            counters[name].in_flight)
     return retdict
 
 
-def disk_partitions(all=False):
-    """Return mounted disk partitions as a list of namedtuples"""
+class MountsCache:
+    """Cache the results of mount related functions until the mount
+    table changes. poll()ing /proc/self/mounts reports POLLPRI (and
+    POLLERR) once after something was mounted or unmounted in the
+    mount namespace of this process.
+    If the file cannot be polled nothing is cached.
+    """
+
+    def __init__(self, path="/proc/self/mounts"):
+        self._path = path
+        self._file = None
+        self._poller = None
+        self._pid = None
+        self._lock = threading.Lock()
+        self._cache = {}
+
+    def _open(self):
+        self.close()
+        try:
+            f = open_binary(self._path)
+        except EnvironmentError:
+            return
+        try:
+            poller = select.poll()
+            poller.register(f.fileno(), select.POLLPRI | select.POLLERR)
+            # consume the event of a change which may have happened
+            # before we opened the file
+            poller.poll(0)
+        except (AttributeError, EnvironmentError, select.error):
+            f.close()
+            return
+        self._file = f
+        self._poller = poller
+        self._pid = os.getpid()
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+            self._poller = None
+
+    def _changed(self):
+        if self._file is None or self._pid != os.getpid():
+            # first call, previous error or we were forked (the file
+            # offset and poll state are shared with the parent)
+            self._open()
+            return True
+        try:
+            events = self._poller.poll(0)
+        except (EnvironmentError, select.error):
+            self.close()
+            return True
+        return bool(events)
+
+    def get(self, fun, *args):
+        """Return the cached result of 'fun(*args)', calling it only
+        if the mount table changed since it was cached.
+        """
+        with self._lock:
+            if self._changed() or self._file is None:
+                self._cache.clear()
+            key = (fun, args)
+            try:
+                return self._cache[key]
+            except KeyError:
+                ret = self._cache[key] = fun(*args)
+                return ret
+
+
+mounts_cache = MountsCache()
+
+
+def _unescape_mount_field(s):
+    # mount points, devices, etc. have ' ', '\t', '\n' and '\\'
+    # escaped as octal sequences (e.g. '\040')
+    if '\\' not in s:
+        return s
+    return re.sub(r'\\([0-7]{3})', lambda m: chr(int(m.group(1), 8)), s)
+
+
+def read_mountinfo(procfs_path):
+    """Parse /proc/self/mountinfo and return a list of
+    (device, mountpoint, fstype, opts, mount_id, parent_id, major,
+    minor, root, propagation) tuples. 'opts' combines per-mount
+    and per-superblock options the same way /proc/mounts does.
+    See:
+    https://www.kernel.org/doc/Documentation/filesystems/proc.txt
+    """
+    retlist = []
+    with open_text("%s/self/mountinfo" % procfs_path) as f:
+        for line in f:
+            # 36 35 98:0 /mnt1 /mnt2 rw,noatime master:1 - ext3 /dev/root
+            #     rw,errors=continue
+            fields = line.split()
+            sep = fields.index('-', 6)
+            mount_id, parent_id, devnum, root, mountpoint, mount_opts = \
+                fields[:6]
+            fstype, device, super_opts = (fields[sep + 1:sep + 4] +
+                                          [''] * 3)[:3]
+            major, minor = devnum.split(':')
+            opts = mount_opts.split(',')
+            super_opts = super_opts.split(',')
+            if super_opts[0] == 'ro':
+                opts[0] = 'ro'
+            opts += [x for x in super_opts[1:] if x and x not in opts]
+            retlist.append((
+                _unescape_mount_field(device),
+                _unescape_mount_field(mountpoint),
+                _unescape_mount_field(fstype),
+                ','.join(opts),
+                int(mount_id), int(parent_id), int(major), int(minor),
+                _unescape_mount_field(root),
+                tuple(fields[6:sep])))
+    return retlist
+
+
+def _get_fstypes(procfs_path):
     fstypes = set()
-    with open_text("%s/filesystems" % get_procfs_path()) as f:
+    with open_text("%s/filesystems" % procfs_path) as f:
         for line in f:
             line = line.strip()
             if not line.startswith("nodev"):
@@ -839,22 +2257,189 @@ def disk_partitions(all=False):
                 fstype = line.split("\t")[1]
                 if fstype == "zfs":
                     fstypes.add("zfs")
+    return frozenset(fstypes)
 
+
+def _disk_partitions(procfs_path, all, extended):
+    fstypes = _get_fstypes(procfs_path)
+    try:
+        partitions = read_mountinfo(procfs_path)
+    except EnvironmentError as err:
+        # Linux < 2.6.26
+        if err.errno != errno.ENOENT or extended:
+            raise
+        partitions = cext.disk_partitions()
     retlist = []
-    partitions = cext.disk_partitions()
     for partition in partitions:
-        device, mountpoint, fstype, opts = partition
+        device, mountpoint, fstype, opts = partition[:4]
         if device == 'none':
             device = ''
         if not all:
             if device == '' or fstype not in fstypes:
                 continue
-        ntuple = _common.sdiskpart(device, mountpoint, fstype, opts)
+        if extended:
+            ntuple = sdiskpartx(device, mountpoint, fstype, opts,
+                                *partition[4:])
+        else:
+            ntuple = _common.sdiskpart(device, mountpoint, fstype, opts)
         retlist.append(ntuple)
     return retlist
 
 
+def disk_partitions(all=False, extended=False):
+    """Return mounted disk partitions as a list of namedtuples.
+    The result is cached until something is mounted or unmounted.
+    """
+    procfs_path = get_procfs_path()
+    if procfs_path != '/proc':
+        return _disk_partitions(procfs_path, all, extended)
+    # namedtuples are immutable, the list is not
+    return list(mounts_cache.get(_disk_partitions, procfs_path, bool(all),
+                                 bool(extended)))
+
+
 disk_usage = _psposix.disk_usage
+disk_usage_inodes = _psposix.disk_usage_inodes
+
+
+# --- pressure stall information (PSI, Linux >= 4.20)
+
+PSI_RESOURCES = ('cpu', 'memory', 'io', 'irq')
+
+
+def _cgroup2_path():
+    """Return the mount point of the cgroup v2 hierarchy, which is not
+    /sys/fs/cgroup on systems using the "hybrid" layout.
+    """
+    for part in disk_partitions(all=True):
+        if part.fstype == 'cgroup2':
+            return part.mountpoint
+    return '/sys/fs/cgroup'
+
+
+def pressure_path(resource, cgroup=None):
+    if resource not in PSI_RESOURCES:
+        raise ValueError("invalid resource %r; choose between %s" % (
+            resource, ', '.join(map(repr, PSI_RESOURCES))))
+    if cgroup is None:
+        return "%s/pressure/%s" % (get_procfs_path(), resource)
+    # 'cgroup' is relative to the cgroup v2 root, as in
+    # /proc/{pid}/cgroup (e.g. "/system.slice/sshd.service")
+    path = _cgroup2_path()
+    cgroup = cgroup.strip('/')
+    if cgroup:
+        path = "%s/%s" % (path, cgroup)
+    return "%s/%s.pressure" % (path, resource)
+
+
+def pressure(resource, cgroup=None):
+    """Return pressure stall information of 'resource' ('cpu',
+    'memory', 'io' or 'irq'), system-wide or of a cgroup, as a
+    (some, full) namedtuple.
+    """
+    ret = {'some': None, 'full': None}
+    with open_binary(pressure_path(resource, cgroup)) as f:
+        for line in f:
+            # some avg10=0.00 avg60=0.00 avg300=0.00 total=0
+            fields = line.split()
+            if not fields:
+                continue
+            values = dict([x.split(b'=') for x in fields[1:]])
+            kind = fields[0].decode('ascii') if PY3 else fields[0]
+            ret[kind] = spsi(float(values[b'avg10']),
+                             float(values[b'avg60']),
+                             float(values[b'avg300']),
+                             int(values[b'total']))
+    return spressure(ret['some'], ret['full'])
+
+
+class PressureTrigger(object):
+    """Register a PSI trigger which fires when tasks are stalled on
+    'resource' ('cpu', 'memory', 'io' or 'irq') for more than
+    'stall' seconds within a 'window' seconds period ('kind' is
+    either 'some' or 'full'). The kernel checks the condition
+    itself: wait() blocks until it does.
+    See: https://www.kernel.org/doc/html/latest/accounting/psi.html
+    """
+
+    def __init__(self, resource, stall, window, kind='some', cgroup=None):
+        if kind not in ('some', 'full'):
+            raise ValueError("kind must be either 'some' or 'full' "
+                             "(got %r)" % kind)
+        # the kernel wants microseconds
+        stall_us = int(round(stall * 1000000))
+        window_us = int(round(window * 1000000))
+        if not 500000 <= window_us <= 10000000:
+            raise ValueError("window must be between 0.5 and 10 seconds "
+                             "(got %r)" % window)
+        if not 0 < stall_us <= window_us:
+            raise ValueError("stall must be greater than 0 and not greater "
+                             "than window (got %r)" % stall)
+        self.path = pressure_path(resource, cgroup)
+        self.resource = resource
+        self.kind = kind
+        self.stall = stall
+        self.window = window
+        self._fd = os.open(self.path, os.O_RDWR | os.O_NONBLOCK)
+        try:
+            # the trigger lives as long as the file is open
+            os.write(self._fd, ("%s %d %d\0" % (
+                kind, stall_us, window_us)).encode('ascii'))
+            self._poller = select.poll()
+            self._poller.register(self._fd, select.POLLPRI)
+        except Exception:
+            os.close(self._fd)
+            self._fd = None
+            raise
+
+    def __repr__(self):
+        return "%s(resource=%r, stall=%r, window=%r, kind=%r, path=%r)" % (
+            self.__class__.__name__, self.resource, self.stall,
+            self.window, self.kind, self.path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def fileno(self):
+        """The file descriptor of the trigger, which becomes ready
+        with POLLPRI (EPOLLPRI) when the trigger fires.
+        """
+        if self._fd is None:
+            raise ValueError("trigger is closed")
+        return self._fd
+
+    def wait(self, timeout=None):
+        """Wait for the trigger to fire for at most 'timeout' seconds
+        (forever if None). Return True if it fired, False on timeout.
+        """
+        if self._fd is None:
+            raise ValueError("trigger is closed")
+        ms = None if timeout is None else max(int(timeout * 1000), 0)
+        while True:
+            try:
+                events = self._poller.poll(ms)
+            except select.error as err:
+                if err.args[0] != errno.EINTR:
+                    raise
+                continue
+            break
+        for fd, event in events:
+            if event & (select.POLLERR | select.POLLHUP | select.POLLNVAL):
+                # e.g. the cgroup was removed
+                raise OSError(errno.ENODEV, "%s is no longer monitored" %
+                              self.path)
+            if event & select.POLLPRI:
+                return True
+        return False
+
+    def close(self):
+        """Unregister the trigger."""
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
 
 
 # --- decorators
@@ -1329,7 +2914,12 @@ class Process(object):
 
     @wrap_exceptions
     def num_fds(self):
-        return len(os.listdir("%s/%s/fd" % (self._procfs_path, self.pid)))
+        path = "%s/%s/fd" % (self._procfs_path, self.pid)
+        if fd_dir_has_size(self._procfs_path):
+            # Linux >= 6.2: st_size is the number of open fds; this
+            # avoids allocating a list containing all fd names.
+            return os.stat(path).st_size
+        return len(os.listdir(path))
 
     @wrap_exceptions
     def ppid(self):
@@ -12,6 +12,7 @@ import time
 
 from ._common import memoize
 from ._common import sdiskusage
+from ._common import sdiskusagex
 from ._common import usage_percent
 from ._compat import PY3
 from ._compat import unicode
@@ -116,10 +117,9 @@ def wait_pid(pid, timeout=None):
                 raise ValueError("unknown process exit status %r" % status)
 
 
-def disk_usage(path):
-    """Return disk usage associated with path."""
+def _statvfs(path):
     try:
-        st = os.statvfs(path)
+        return os.statvfs(path)
     except UnicodeEncodeError:
         if not PY3 and isinstance(path, unicode):
             # this is a bug with os.statvfs() and unicode on
@@ -130,9 +130,12 @@ def disk_usage(path):
                 path = path.encode(sys.getfilesystemencoding())
             except UnicodeEncodeError:
                 pass
-            st = os.statvfs(path)
+            return os.statvfs(path)
         else:
             raise
+
+
+def _disk_usage(st):
     free = (st.f_bavail * st.f_frsize)
     total = (st.f_blocks * st.f_frsize)
     used = (st.f_blocks - st.f_bfree) * st.f_frsize
@@ -140,7 +143,21 @@ def disk_usage(path):
     # NB: the percentage is -5% than what shown by df due to
     # reserved blocks that we are currently not considering:
     # http://goo.gl/sWGbH
-    return sdiskusage(total, used, free, percent)
+    return (total, used, free, percent)
+
+
+def disk_usage(path):
+    """Return disk usage associated with path."""
+    return sdiskusage(*_disk_usage(_statvfs(path)))
+
+
+def disk_usage_inodes(path):
+    """Return disk and inodes usage associated with path."""
+    st = _statvfs(path)
+    inodes_used = st.f_files - st.f_ffree
+    inodes_percent = usage_percent(inodes_used, st.f_files, _round=1)
+    return sdiskusagex(*_disk_usage(st) + (
+        st.f_files, inodes_used, st.f_ffree, inodes_percent))
 
 
 @memoize
@@ -84,6 +84,7 @@ def get_procfs_path():
 disk_io_counters = cext.disk_io_counters
 net_io_counters = cext.net_io_counters
 disk_usage = _psposix.disk_usage
+disk_usage_inodes = _psposix.disk_usage_inodes
 net_if_addrs = cext_posix.net_if_addrs
 
 
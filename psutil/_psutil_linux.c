@@ -9,9 +9,11 @@
 #ifndef _GNU_SOURCE
     #define _GNU_SOURCE 1
 #endif
+#define PY_SSIZE_T_CLEAN
 #include <Python.h>
 #include <errno.h>
 #include <stdlib.h>
+#include <stddef.h>
 #include <mntent.h>
 #include <features.h>
 #include <utmp.h>
@@ -23,6 +25,7 @@
 #include <sys/socket.h>
 #include <linux/sockios.h>
 #include <linux/if.h>
+#include <netinet/in.h>
 
 // see: https://github.com/giampaolo/psutil/issues/659
 #ifdef PSUTIL_ETHTOOL_MISSING_TYPES
@@ -54,6 +57,27 @@ static const int NCPUS_START = sizeof(unsigned long) * CHAR_BIT;
     #include <sys/resource.h>
 #endif
 
+// NETLINK_SOCK_DIAG (inet_diag and unix_diag), Linux >= 3.3
+#define PSUTIL_HAVE_SOCK_DIAG \
+    (LINUX_VERSION_CODE >= KERNEL_VERSION(3, 3, 0))
+
+#include <linux/netlink.h>
+#include <linux/rtnetlink.h>
+
+#if PSUTIL_HAVE_SOCK_DIAG
+    #include <sys/un.h>
+    #include <netinet/tcp.h>  // struct tcp_info
+    #include <linux/sock_diag.h>
+    #include <linux/inet_diag.h>
+    #include <linux/unix_diag.h>
+#endif
+
+#if PY_MAJOR_VERSION >= 3
+    #define PSUTIL_BYTES_FMT "y#"
+#else
+    #define PSUTIL_BYTES_FMT "s#"
+#endif
+
 
 // May happen on old RedHat versions, see:
 // https://github.com/giampaolo/psutil/issues/607
@@ -551,6 +575,571 @@ error:
 }
 
 
+
+/*
+ * Return the (duplex, speed) of every network interface in the
+ * 'names' sequence as a list, by using a single socket for all the
+ * ETHTOOL_GSET ioctl()s. Interfaces which disappeared in the
+ * meantime are set to None.
+ */
+static PyObject*
+psutil_net_if_duplex_speed(PyObject* self, PyObject* args) {
+    PyObject *py_names = NULL;
+    PyObject *py_seq = NULL;
+    PyObject *py_retlist = NULL;
+    PyObject *py_tuple = NULL;
+    Py_ssize_t i;
+    Py_ssize_t n;
+    const char *nic_name;
+    int sock = -1;
+    int duplex;
+    int speed;
+    struct ifreq ifr;
+    struct ethtool_cmd ethcmd;
+
+    if (! PyArg_ParseTuple(args, "O", &py_names))
+        return NULL;
+    py_seq = PySequence_Fast(py_names, "expected a sequence");
+    if (py_seq == NULL)
+        return NULL;
+    n = PySequence_Fast_GET_SIZE(py_seq);
+    py_retlist = PyList_New(n);
+    if (py_retlist == NULL)
+        goto error;
+
+    sock = socket(AF_INET, SOCK_DGRAM | SOCK_CLOEXEC, 0);
+    if (sock == -1) {
+        PyErr_SetFromErrno(PyExc_OSError);
+        goto error;
+    }
+    for (i = 0; i < n; i++) {
+#if PY_MAJOR_VERSION >= 3
+        nic_name = PyUnicode_AsUTF8(PySequence_Fast_GET_ITEM(py_seq, i));
+#else
+        nic_name = PyString_AsString(PySequence_Fast_GET_ITEM(py_seq, i));
+#endif
+        if (nic_name == NULL)
+            goto error;
+        memset(&ifr, 0, sizeof(ifr));
+        strncpy(ifr.ifr_name, nic_name, sizeof(ifr.ifr_name) - 1);
+        memset(&ethcmd, 0, sizeof(ethcmd));
+        ethcmd.cmd = ETHTOOL_GSET;
+        ifr.ifr_data = (void *)&ethcmd;
+        if (ioctl(sock, SIOCETHTOOL, &ifr) != -1) {
+            duplex = ethcmd.duplex;
+            speed = ethcmd.speed;
+        }
+        else if (errno == EOPNOTSUPP) {
+            // we typically get here in case of wi-fi cards
+            duplex = DUPLEX_UNKNOWN;
+            speed = 0;
+        }
+        else if (errno == ENODEV) {
+            Py_INCREF(Py_None);
+            PyList_SET_ITEM(py_retlist, i, Py_None);
+            continue;
+        }
+        else {
+            PyErr_SetFromErrno(PyExc_OSError);
+            goto error;
+        }
+        py_tuple = Py_BuildValue("(ii)", duplex, speed);
+        if (py_tuple == NULL)
+            goto error;
+        PyList_SET_ITEM(py_retlist, i, py_tuple);
+    }
+
+    close(sock);
+    Py_DECREF(py_seq);
+    return py_retlist;
+
+error:
+    if (sock != -1)
+        close(sock);
+    Py_XDECREF(py_retlist);
+    Py_DECREF(py_seq);
+    return NULL;
+}
+
+
+// Size of the buffer used to receive netlink messages; the kernel
+// won't send more than that in a single datagram.
+#define PSUTIL_NL_BUFSIZE 32768
+
+/*
+ * Send a dump request of the given 'type' (e.g. SOCK_DIAG_BY_FAMILY,
+ * RTM_GETLINK) over a netlink socket of the given 'protocol' and call
+ * 'callback' for every message the kernel replies with.
+ * 'req' is the family-specific request (e.g. inet_diag_req_v2),
+ * optionally followed by netlink attributes.
+ * Return 0 on success or -1 on failure, in which case either a Python
+ * exception was raised by 'callback' or errno is set.
+ */
+static int
+psutil_netlink_dump(int protocol, int type, void *req, size_t req_len,
+                    int (*callback)(struct nlmsghdr *, void *),
+                    void *ctx) {
+    int sock;
+    int done = 0;
+    int ret = -1;
+    ssize_t len;
+    char *buf = NULL;
+    struct sockaddr_nl nladdr;
+    struct nlmsghdr nlh;
+    struct nlmsghdr *h;
+    struct nlmsgerr *err;
+    struct iovec iov[2];
+    struct msghdr msg;
+
+    sock = socket(AF_NETLINK, SOCK_RAW | SOCK_CLOEXEC, protocol);
+    if (sock == -1)
+        return -1;
+    buf = malloc(PSUTIL_NL_BUFSIZE);
+    if (buf == NULL) {
+        errno = ENOMEM;
+        goto error;
+    }
+
+    memset(&nladdr, 0, sizeof(nladdr));
+    nladdr.nl_family = AF_NETLINK;
+    memset(&nlh, 0, sizeof(nlh));
+    nlh.nlmsg_len = NLMSG_LENGTH(req_len);
+    nlh.nlmsg_type = type;
+    nlh.nlmsg_flags = NLM_F_REQUEST | NLM_F_DUMP;
+    nlh.nlmsg_seq = 1;
+    iov[0].iov_base = &nlh;
+    iov[0].iov_len = sizeof(nlh);
+    iov[1].iov_base = req;
+    iov[1].iov_len = req_len;
+    memset(&msg, 0, sizeof(msg));
+    msg.msg_name = &nladdr;
+    msg.msg_namelen = sizeof(nladdr);
+    msg.msg_iov = iov;
+    msg.msg_iovlen = 2;
+    if (sendmsg(sock, &msg, 0) == -1)
+        goto error;
+
+    while (! done) {
+        Py_BEGIN_ALLOW_THREADS
+        len = recv(sock, buf, PSUTIL_NL_BUFSIZE, 0);
+        Py_END_ALLOW_THREADS
+        if (len == -1) {
+            if (errno == EINTR)
+                continue;
+            goto error;
+        }
+        if (len == 0) {
+            errno = EIO;
+            goto error;
+        }
+        h = (struct nlmsghdr *)buf;
+        while (NLMSG_OK(h, len)) {
+            if (h->nlmsg_type == NLMSG_DONE) {
+                done = 1;
+                break;
+            }
+            if (h->nlmsg_type == NLMSG_ERROR) {
+                err = (struct nlmsgerr *)NLMSG_DATA(h);
+                errno = -err->error;
+                goto error;
+            }
+            if (callback(h, ctx) != 0)
+                goto error;
+            h = NLMSG_NEXT(h, len);
+        }
+    }
+    ret = 0;
+
+error:
+    if (buf != NULL)
+        free(buf);
+    close(sock);
+    return ret;
+}
+
+
+// rtnl_link_stats64 fields we know about; newer kernels may append
+// more of them, older ones may send less.
+#define PSUTIL_LINK_NSTATS 24
+
+/*
+ * Turn a RTM_NEWLINK message into a (name, flags, mtu, stats) tuple
+ * and append it to the list passed as 'ctx'. 'stats' is a tuple of
+ * the rtnl_link_stats64 fields, or of the 32-bit rtnl_link_stats ones
+ * on kernels lacking IFLA_STATS64.
+ */
+static int
+psutil_link_cb(struct nlmsghdr *h, void *ctx) {
+    PyObject *py_retlist = (PyObject *)ctx;
+    PyObject *py_tuple = NULL;
+    PyObject *py_stats = NULL;
+    PyObject *py_value = NULL;
+    struct ifinfomsg *ifi = NLMSG_DATA(h);
+    struct rtattr *attr;
+    int attrlen;
+    char name[IFNAMSIZ + 1];
+    unsigned int mtu = 0;
+    unsigned long long stats[PSUTIL_LINK_NSTATS];
+    unsigned int stats32[PSUTIL_LINK_NSTATS];
+    int have_stats64 = 0;
+    size_t len;
+    int i;
+
+    if (h->nlmsg_type != RTM_NEWLINK)
+        return 0;
+    name[0] = '\0';
+    memset(stats, 0, sizeof(stats));
+    memset(stats32, 0, sizeof(stats32));
+    attr = IFLA_RTA(ifi);
+    attrlen = h->nlmsg_len - NLMSG_LENGTH(sizeof(*ifi));
+    while (RTA_OK(attr, attrlen)) {
+        len = RTA_PAYLOAD(attr);
+        if (attr->rta_type == IFLA_IFNAME) {
+            if (len > IFNAMSIZ)
+                len = IFNAMSIZ;
+            memcpy(name, RTA_DATA(attr), len);
+            name[len] = '\0';
+        }
+        else if (attr->rta_type == IFLA_MTU && len >= sizeof(mtu)) {
+            memcpy(&mtu, RTA_DATA(attr), sizeof(mtu));
+        }
+#ifdef IFLA_STATS64
+        else if (attr->rta_type == IFLA_STATS64) {
+            if (len > sizeof(stats))
+                len = sizeof(stats);
+            memcpy(stats, RTA_DATA(attr), len);
+            have_stats64 = 1;
+        }
+#endif
+        else if (attr->rta_type == IFLA_STATS) {
+            if (len > sizeof(stats32))
+                len = sizeof(stats32);
+            memcpy(stats32, RTA_DATA(attr), len);
+        }
+        attr = RTA_NEXT(attr, attrlen);
+    }
+
+    py_stats = PyTuple_New(PSUTIL_LINK_NSTATS);
+    if (py_stats == NULL)
+        return -1;
+    for (i = 0; i < PSUTIL_LINK_NSTATS; i++) {
+        if (have_stats64)
+            py_value = PyLong_FromUnsignedLongLong(stats[i]);
+        else
+            py_value = PyLong_FromUnsignedLong(stats32[i]);
+        if (py_value == NULL)
+            goto error;
+        PyTuple_SET_ITEM(py_stats, i, py_value);
+    }
+    py_tuple = Py_BuildValue("(sIIO)", name, ifi->ifi_flags, mtu, py_stats);
+    if (py_tuple == NULL)
+        goto error;
+    if (PyList_Append(py_retlist, py_tuple))
+        goto error;
+    Py_DECREF(py_tuple);
+    Py_DECREF(py_stats);
+    return 0;
+
+error:
+    Py_XDECREF(py_tuple);
+    Py_DECREF(py_stats);
+    return -1;
+}
+
+
+/*
+ * Return all network interfaces as a list of
+ * (name, flags, mtu, stats) tuples by using a single netlink
+ * RTM_GETLINK dump instead of reading /proc/net/dev and issuing
+ * ioctl()s for every interface.
+ */
+static PyObject *
+psutil_net_if_links(PyObject *self, PyObject *args) {
+    struct ifinfomsg req;
+    PyObject *py_retlist = PyList_New(0);
+
+    if (py_retlist == NULL)
+        return NULL;
+    memset(&req, 0, sizeof(req));
+    req.ifi_family = AF_UNSPEC;
+    if (psutil_netlink_dump(NETLINK_ROUTE, RTM_GETLINK, &req, sizeof(req),
+                            psutil_link_cb, py_retlist) != 0) {
+        if (! PyErr_Occurred())
+            PyErr_SetFromErrno(PyExc_OSError);
+        Py_DECREF(py_retlist);
+        return NULL;
+    }
+    return py_retlist;
+}
+
+
+#if PSUTIL_HAVE_SOCK_DIAG
+/*
+ * Turn an inet_diag message into a Python tuple and append it to
+ * the list passed as 'ctx'. The last item is a
+ * (rtt, rttvar, retransmits, cwnd) tuple if the message carries an
+ * INET_DIAG_INFO attribute (TCP sockets only, and only if requested),
+ * else None.
+ */
+static int
+psutil_inet_diag_cb(struct nlmsghdr *h, void *ctx) {
+    PyObject *py_retlist = (PyObject *)ctx;
+    PyObject *py_tuple = NULL;
+    PyObject *py_info = NULL;
+    struct inet_diag_msg *r = NLMSG_DATA(h);
+    Py_ssize_t addrlen = r->idiag_family == AF_INET ? 4 : 16;
+    struct rtattr *attr;
+    int attrlen;
+    struct tcp_info info;
+    // tcp_info grew over time; the fields we need were there since
+    // the beginning
+    size_t info_len = offsetof(struct tcp_info, tcpi_snd_cwnd) +
+                      sizeof(info.tcpi_snd_cwnd);
+
+    attr = (struct rtattr *)(r + 1);
+    attrlen = h->nlmsg_len - NLMSG_LENGTH(sizeof(*r));
+    while (RTA_OK(attr, attrlen)) {
+        if (attr->rta_type == INET_DIAG_INFO &&
+                RTA_PAYLOAD(attr) >= info_len) {
+            memset(&info, 0, sizeof(info));
+            memcpy(&info, RTA_DATA(attr), info_len);
+            py_info = Py_BuildValue(
+                "(IIiI)",
+                info.tcpi_rtt,                  // rtt (usecs)
+                info.tcpi_rttvar,               // rttvar (usecs)
+                (int)info.tcpi_retransmits,     // retransmits
+                info.tcpi_snd_cwnd);            // cwnd
+            if (py_info == NULL)
+                return -1;
+            break;
+        }
+        attr = RTA_NEXT(attr, attrlen);
+    }
+    if (py_info == NULL) {
+        Py_INCREF(Py_None);
+        py_info = Py_None;
+    }
+
+    py_tuple = Py_BuildValue(
+        "(" PSUTIL_BYTES_FMT "i" PSUTIL_BYTES_FMT "iikIIO)",
+        (char *)r->id.idiag_src, addrlen,  // laddr
+        (int)ntohs(r->id.idiag_sport),     // lport
+        (char *)r->id.idiag_dst, addrlen,  // raddr
+        (int)ntohs(r->id.idiag_dport),     // rport
+        (int)r->idiag_state,               // state
+        (unsigned long)r->idiag_inode,     // inode
+        r->idiag_rqueue,                   // rqueue
+        r->idiag_wqueue,                   // wqueue
+        py_info);                          // tcp_info
+    Py_DECREF(py_info);
+    if (py_tuple == NULL)
+        return -1;
+    if (PyList_Append(py_retlist, py_tuple)) {
+        Py_DECREF(py_tuple);
+        return -1;
+    }
+    Py_DECREF(py_tuple);
+    return 0;
+}
+
+
+/*
+ * Return TCP or UDP sockets of the given family as a list of
+ * (laddr, lport, raddr, rport, state, inode, rqueue, wqueue, info) tuples
+ * by using NETLINK_SOCK_DIAG instead of parsing /proc/net/{tcp,udp}*.
+ * Addresses are returned in packed (network order) form.
+ * 'states' is a bitmask of TCP states (1 << state) used by the kernel
+ * to filter results. 'lport' and 'rport' (-1 means "any") are turned
+ * into an inet_diag bytecode filter so that the kernel only returns
+ * sockets bound to / connected to those ports.
+ * If 'info' is true the kernel is asked to include tcp_info of TCP
+ * sockets in the same dump (INET_DIAG_INFO).
+ */
+static PyObject *
+psutil_net_connections_inet(PyObject *self, PyObject *args) {
+    int family;
+    int protocol;
+    unsigned int states;
+    int lport;
+    int rport;
+    int info;
+    int nops = 0;
+    int i;
+    int bclen;
+    struct {
+        struct inet_diag_req_v2 req;
+        struct rtattr rta;
+        // at most two conditions per port, each one taking two ops
+        struct inet_diag_bc_op ops[8];
+    } req;
+    size_t req_len = sizeof(req.req);
+    PyObject *py_retlist = NULL;
+
+    if (! PyArg_ParseTuple(args, "iiIiii", &family, &protocol, &states,
+                           &lport, &rport, &info))
+        return NULL;
+    py_retlist = PyList_New(0);
+    if (py_retlist == NULL)
+        return NULL;
+
+    memset(&req, 0, sizeof(req));
+    req.req.sdiag_family = family;
+    req.req.sdiag_protocol = protocol;
+    req.req.idiag_states = states;
+    if (info)
+        req.req.idiag_ext |= 1 << (INET_DIAG_INFO - 1);
+
+    // Each port condition is expressed as "port >= N && port <= N".
+    // A condition consists of two ops: the comparison, and a second op
+    // whose 'no' field carries the port. On match we jump to the next
+    // condition ('yes'), else past the end of the program, which
+    // means "reject" ('no').
+    if (lport != -1) {
+        req.ops[nops++].code = INET_DIAG_BC_S_GE;
+        req.ops[nops++].no = lport;
+        req.ops[nops++].code = INET_DIAG_BC_S_LE;
+        req.ops[nops++].no = lport;
+    }
+    if (rport != -1) {
+        req.ops[nops++].code = INET_DIAG_BC_D_GE;
+        req.ops[nops++].no = rport;
+        req.ops[nops++].code = INET_DIAG_BC_D_LE;
+        req.ops[nops++].no = rport;
+    }
+    if (nops > 0) {
+        bclen = nops * sizeof(struct inet_diag_bc_op);
+        for (i = 0; i < nops; i += 2) {
+            req.ops[i].yes = 2 * sizeof(struct inet_diag_bc_op);
+            req.ops[i].no = bclen - i * sizeof(struct inet_diag_bc_op) + 4;
+        }
+        req.rta.rta_type = INET_DIAG_REQ_BYTECODE;
+        req.rta.rta_len = RTA_LENGTH(bclen);
+        req_len += RTA_SPACE(bclen);
+    }
+
+    if (psutil_netlink_dump(NETLINK_SOCK_DIAG, SOCK_DIAG_BY_FAMILY,
+                            &req, req_len, psutil_inet_diag_cb,
+                            py_retlist) != 0)
+        goto error;
+    return py_retlist;
+
+error:
+    if (! PyErr_Occurred())
+        PyErr_SetFromErrno(PyExc_OSError);
+    Py_DECREF(py_retlist);
+    return NULL;
+}
+
+
+/*
+ * Turn an unix_diag message into a Python tuple and append it to
+ * the list passed as 'ctx'.
+ */
+static int
+psutil_unix_diag_cb(struct nlmsghdr *h, void *ctx) {
+    PyObject *py_retlist = (PyObject *)ctx;
+    PyObject *py_tuple = NULL;
+    PyObject *py_path = NULL;
+    struct unix_diag_msg *r = NLMSG_DATA(h);
+    struct rtattr *attr;
+    int attrlen;
+    char path[sizeof(((struct sockaddr_un *)0)->sun_path) + 1];
+    Py_ssize_t pathlen = 0;
+    Py_ssize_t i;
+    unsigned int peer = 0;
+    struct unix_diag_rqlen rqlen = {0, 0};
+
+    attr = (struct rtattr *)(r + 1);
+    attrlen = h->nlmsg_len - NLMSG_LENGTH(sizeof(*r));
+    while (RTA_OK(attr, attrlen)) {
+        if (attr->rta_type == UNIX_DIAG_PEER &&
+                RTA_PAYLOAD(attr) >= sizeof(peer)) {
+            memcpy(&peer, RTA_DATA(attr), sizeof(peer));
+        }
+        else if (attr->rta_type == UNIX_DIAG_RQLEN &&
+                RTA_PAYLOAD(attr) >= sizeof(rqlen)) {
+            memcpy(&rqlen, RTA_DATA(attr), sizeof(rqlen));
+        }
+        else if (attr->rta_type == UNIX_DIAG_NAME) {
+            pathlen = RTA_PAYLOAD(attr);
+            if (pathlen > (Py_ssize_t)sizeof(path) - 1)
+                pathlen = sizeof(path) - 1;
+            memcpy(path, RTA_DATA(attr), pathlen);
+            // Mimic /proc/net/unix: file system paths include the
+            // string terminator whereas abstract names start with a
+            // null byte; null bytes are shown as '@'.
+            if (pathlen > 0 && path[0] != '\0')
+                pathlen--;
+            for (i = 0; i < pathlen; i++) {
+                if (path[i] == '\0')
+                    path[i] = '@';
+            }
+        }
+        attr = RTA_NEXT(attr, attrlen);
+    }
+
+#if PY_MAJOR_VERSION >= 3
+    py_path = PyUnicode_DecodeFSDefaultAndSize(path, pathlen);
+#else
+    py_path = PyString_FromStringAndSize(path, pathlen);
+#endif
+    if (py_path == NULL)
+        return -1;
+    py_tuple = Py_BuildValue(
+        "(iikOkII)",
+        (int)r->udiag_type,             // type
+        (int)r->udiag_state,            // state
+        (unsigned long)r->udiag_ino,    // inode
+        py_path,                        // path
+        (unsigned long)peer,            // peer inode
+        rqlen.udiag_rqueue,             // rqueue
+        rqlen.udiag_wqueue);            // wqueue
+    Py_DECREF(py_path);
+    if (py_tuple == NULL)
+        return -1;
+    if (PyList_Append(py_retlist, py_tuple)) {
+        Py_DECREF(py_tuple);
+        return -1;
+    }
+    Py_DECREF(py_tuple);
+    return 0;
+}
+
+
+/*
+ * Return UNIX sockets as a list of
+ * (type, state, inode, path, peer_inode, rqueue, wqueue) tuples by using
+ * NETLINK_SOCK_DIAG instead of parsing /proc/net/unix.
+ * 'peer_inode' is 0 if the socket is not connected. For listening
+ * sockets 'rqueue' and 'wqueue' are the number of pending connections
+ * and the backlog.
+ */
+static PyObject *
+psutil_net_connections_unix(PyObject *self, PyObject *args) {
+    struct unix_diag_req req;
+    PyObject *py_retlist = PyList_New(0);
+
+    if (py_retlist == NULL)
+        return NULL;
+    memset(&req, 0, sizeof(req));
+    req.sdiag_family = AF_UNIX;
+    req.udiag_states = (unsigned int)-1;
+    req.udiag_show = UDIAG_SHOW_NAME | UDIAG_SHOW_PEER | UDIAG_SHOW_RQLEN;
+    if (psutil_netlink_dump(NETLINK_SOCK_DIAG, SOCK_DIAG_BY_FAMILY,
+                            &req, sizeof(req), psutil_unix_diag_cb,
+                            py_retlist) != 0)
+        goto error;
+    return py_retlist;
+
+error:
+    if (! PyErr_Occurred())
+        PyErr_SetFromErrno(PyExc_OSError);
+    Py_DECREF(py_retlist);
+    return NULL;
+}
+#endif  // PSUTIL_HAVE_SOCK_DIAG
+
+
 /*
  * Define the psutil C module methods and initialize the module.
  */
@@ -579,6 +1168,16 @@ PsutilMethods[] = {
      "Return currently connected users as a list of tuples"},
     {"net_if_stats", psutil_net_if_stats, METH_VARARGS,
      "Return NIC stats (isup, duplex, speed, mtu)"},
+    {"net_if_duplex_speed", psutil_net_if_duplex_speed, METH_VARARGS,
+     "Return duplex and speed of many NICs at once"},
+    {"net_if_links", psutil_net_if_links, METH_VARARGS,
+     "Return all NICs flags, MTU and stats via a RTM_GETLINK dump"},
+#if PSUTIL_HAVE_SOCK_DIAG
+    {"net_connections_inet", psutil_net_connections_inet, METH_VARARGS,
+     "Return TCP or UDP sockets via NETLINK_SOCK_DIAG"},
+    {"net_connections_unix", psutil_net_connections_unix, METH_VARARGS,
+     "Return UNIX sockets via NETLINK_SOCK_DIAG"},
+#endif
 
     // --- linux specific
 
@@ -19,3 +19,5 @@ static PyObject* psutil_disk_partitions(PyObject* self, PyObject* args);
 static PyObject* psutil_linux_sysinfo(PyObject* self, PyObject* args);
 static PyObject* psutil_users(PyObject* self, PyObject* args);
 static PyObject* psutil_net_if_stats(PyObject* self, PyObject* args);
+static PyObject* psutil_net_connections_inet(PyObject* self, PyObject* args);
+static PyObject* psutil_net_connections_unix(PyObject* self, PyObject* args);
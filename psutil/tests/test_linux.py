@@ -12,9 +12,11 @@ import io
 import os
 import pprint
 import re
+import select
 import shutil
 import socket
 import struct
+import sys
 import tempfile
 import textwrap
 import time
@@ -24,13 +26,19 @@ try:
     from unittest import mock  # py3
 except ImportError:
     import mock  # requires "pip install mock"
+try:
+    import numpy
+except ImportError:
+    numpy = None
 
 import psutil
 from psutil import LINUX
+from psutil._compat import long
 from psutil._compat import PY3
 from psutil._compat import u
 from psutil.tests import call_until
 from psutil.tests import get_kernel_version
+from psutil.tests import get_test_subprocess
 from psutil.tests import importlib
 from psutil.tests import MEMORY_TOLERANCE
 from psutil.tests import pyrun
@@ -172,6 +180,78 @@ class TestSystemVirtualMemory(unittest.TestCase):
                 self.assertEqual(ret.active, 0)
                 self.assertEqual(ret.inactive, 0)
 
+    def test_meminfo_mocked(self):
+        def open_mock(name, *args, **kwargs):
+            if name == '/proc/meminfo':
+                return io.BytesIO(textwrap.dedent("""\
+                    MemTotal:        1000 kB
+                    MemFree:          100 kB
+                    MemAvailable:     600 kB
+                    Buffers:           50 kB
+                    Cached:           200 kB
+                    SwapCached:         0 kB
+                    Active:           300 kB
+                    Inactive:         150 kB
+                    SwapTotal:        400 kB
+                    SwapFree:         300 kB
+                    HugePages_Total:    2
+                    Hugepagesize:    2048 kB
+                    """).encode())
+            else:
+                return orig_open(name, *args, **kwargs)
+
+        orig_open = open
+        patch_point = 'builtins.open' if PY3 else '__builtin__.open'
+        with mock.patch(patch_point, side_effect=open_mock):
+            with mock.patch('psutil._pslinux.cext.linux_sysinfo') as m:
+                mems = psutil._pslinux.meminfo()
+                self.assertEqual(mems['MemAvailable'], 600 * 1024)
+                self.assertEqual(mems['HugePages_Total'], 2)
+                self.assertEqual(mems['Hugepagesize'], 2048 * 1024)
+                vmem = psutil.virtual_memory()
+                self.assertEqual(vmem.total, 1000 * 1024)
+                self.assertEqual(vmem.free, 100 * 1024)
+                self.assertEqual(vmem.buffers, 50 * 1024)
+                self.assertEqual(vmem.cached, 200 * 1024)
+                # MemAvailable is used instead of free + buffers + cached
+                self.assertEqual(vmem.available, 600 * 1024)
+                self.assertEqual(vmem.percent, 40.0)
+                snap = psutil.memory_snapshot()
+                self.assertEqual(snap.virtual, vmem)
+                self.assertEqual(snap.swap.total, 400 * 1024)
+                self.assertEqual(snap.swap.used, 100 * 1024)
+                self.assertEqual(snap.meminfo, mems)
+                assert not m.called
+
+    def test_available_no_memavailable_mocked(self):
+        # Linux < 3.14
+        def open_mock(name, *args, **kwargs):
+            if name == '/proc/meminfo':
+                return io.BytesIO(textwrap.dedent("""\
+                    MemTotal:        1000 kB
+                    MemFree:          100 kB
+                    Buffers:           50 kB
+                    Cached:           200 kB
+                    Active:           300 kB
+                    Inactive:         150 kB
+                    """).encode())
+            else:
+                return orig_open(name, *args, **kwargs)
+
+        orig_open = open
+        patch_point = 'builtins.open' if PY3 else '__builtin__.open'
+        with mock.patch(patch_point, side_effect=open_mock):
+            vmem = psutil.virtual_memory()
+        self.assertEqual(vmem.available, 350 * 1024)
+
+    def test_memory_snapshot(self):
+        snap = psutil.memory_snapshot()
+        self.assertEqual(snap.virtual.total, snap.meminfo['MemTotal'])
+        self.assertEqual(snap.swap.total, snap.meminfo['SwapTotal'])
+        if 'MemAvailable' in snap.meminfo:
+            self.assertEqual(snap.virtual.available,
+                             snap.meminfo['MemAvailable'])
+
 
 # =====================================================================
 # system swap memory
@@ -230,6 +310,139 @@ class TestSystemSwapMemory(unittest.TestCase):
                 self.assertEqual(ret.sin, 0)
                 self.assertEqual(ret.sout, 0)
 
+    def test_vmstat_mocked(self):
+        def open_mock(name, *args, **kwargs):
+            if name == '/proc/vmstat':
+                return io.BytesIO(textwrap.dedent("""\
+                    nr_free_pages 1000
+                    nr_dirtied 7
+                    pswpin 2
+                    pswpout 3
+                    pgfault %s
+                    pgmajfault 5
+                    allocstall_normal 6
+                    oom_kill 0
+                    """ % pgfault).encode())
+            else:
+                return orig_open(name, *args, **kwargs)
+
+        orig_open = open
+        patch_point = 'builtins.open' if PY3 else '__builtin__.open'
+        pgfault = 100
+        with mock.patch(patch_point, side_effect=open_mock):
+            ret = psutil.vmstat()
+            self.assertEqual(ret['pgfault'], 100)
+            self.assertEqual(ret['allocstall_normal'], 6)
+            self.assertEqual(len(ret), 8)
+            # gauges left out
+            ret = psutil.vmstat(gauges=False)
+            self.assertNotIn('nr_free_pages', ret)
+            self.assertEqual(ret['nr_dirtied'], 7)
+            self.assertEqual(len(ret), 7)
+            swap = psutil.swap_memory()
+            self.assertEqual(swap.sin, 2 * 4 * 1024)
+            self.assertEqual(swap.sout, 3 * 4 * 1024)
+            # rates
+            tracker = psutil.RateTracker(lambda: psutil.vmstat(gauges=False))
+            with mock.patch('psutil._timer', side_effect=[1.0, 3.0]):
+                tracker.rates()
+                pgfault = 300
+                self.assertEqual(tracker.rates()['pgfault'], 100)
+
+    def test_vmstat(self):
+        ret = psutil.vmstat()
+        for name in ('pgfault', 'pgmajfault', 'pswpin', 'pswpout'):
+            self.assertIn(name, ret)
+            self.assertIsInstance(ret[name], (int, long))
+
+
+# =====================================================================
+# system pressure stall information
+# =====================================================================
+
+@unittest.skipUnless(LINUX, "not a Linux system")
+class TestSystemPressure(unittest.TestCase):
+
+    def test_pressure_mocked(self):
+        def open_mock(name, *args, **kwargs):
+            if name in ('/proc/pressure/memory',
+                        '/sys/fs/cgroup/foo.slice/memory.pressure'):
+                return io.BytesIO(textwrap.dedent("""\
+                    some avg10=1.50 avg60=0.25 avg300=0.00 total=1234
+                    full avg10=0.50 avg60=0.00 avg300=0.00 total=56
+                    """).encode())
+            elif name == '/proc/pressure/cpu':
+                # Linux < 5.13 has no "full" line for CPU
+                return io.BytesIO(
+                    b"some avg10=0.00 avg60=0.00 avg300=0.00 total=7\n")
+            else:
+                return orig_open(name, *args, **kwargs)
+
+        orig_open = open
+        patch_point = 'builtins.open' if PY3 else '__builtin__.open'
+        with mock.patch(patch_point, side_effect=open_mock):
+            ret = psutil.pressure('memory')
+            self.assertEqual(ret.some, (1.5, 0.25, 0.0, 1234))
+            self.assertEqual(ret.full.avg10, 0.5)
+            self.assertEqual(ret.full.total, 56)
+            ret = psutil.pressure('cpu')
+            self.assertEqual(ret.some.total, 7)
+            self.assertIsNone(ret.full)
+            with mock.patch('psutil._pslinux._cgroup2_path',
+                            return_value='/sys/fs/cgroup'):
+                ret = psutil.pressure('memory', cgroup='/foo.slice')
+                self.assertEqual(ret.some.total, 1234)
+        self.assertRaises(ValueError, psutil.pressure, 'disk')
+
+    @unittest.skipUnless(os.path.exists('/proc/pressure/cpu'),
+                         "/proc/pressure not available")
+    def test_pressure(self):
+        for resource in ('cpu', 'memory', 'io'):
+            ret = psutil.pressure(resource)
+            for value in ret.some[:3]:
+                self.assertGreaterEqual(value, 0)
+                self.assertLessEqual(value, 100)
+            self.assertGreaterEqual(ret.some.total, 0)
+
+    @unittest.skipUnless(os.path.exists('/proc/pressure/cpu'),
+                         "/proc/pressure not available")
+    def test_pressure_trigger(self):
+        self.assertRaises(ValueError, psutil.PressureTrigger, 'cpu', 1, 2,
+                          kind='foo')
+        self.assertRaises(ValueError, psutil.PressureTrigger, 'disk', 1, 2)
+        # out of the range accepted by the kernel
+        for stall, window in ((0, 2), (-1, 2), (3, 2), (0.1, 0.4),
+                              (1, 11)):
+            self.assertRaises(ValueError, psutil.PressureTrigger, 'cpu',
+                              stall, window)
+        # seconds are rounded to microseconds, not truncated
+        with mock.patch('psutil._pslinux.os.open', return_value=-1):
+            with mock.patch('psutil._pslinux.os.close'):
+                with mock.patch('psutil._pslinux.os.write',
+                                side_effect=OSError(errno.EINVAL, "")) as m:
+                    self.assertRaises(OSError, psutil.PressureTrigger, 'cpu',
+                                      2.01, 4.01)
+                    self.assertEqual(m.call_args[0][1],
+                                     b"some 2010000 4010000\0")
+        try:
+            # unprivileged users can only use multiples of 2 secs
+            trigger = psutil.PressureTrigger('cpu', 1, 2)
+        except EnvironmentError as err:
+            if err.errno not in (errno.EINVAL, errno.EACCES, errno.EPERM):
+                raise
+            raise unittest.SkipTest("can't register PSI trigger (%s)" % err)
+        with trigger:
+            self.assertIsInstance(trigger.wait(0), bool)
+            self.assertEqual(trigger.fileno(), trigger._fd)
+            with mock.patch.object(trigger, '_poller') as m:
+                m.poll.return_value = [(trigger._fd, select.POLLPRI)]
+                self.assertIs(trigger.wait(1), True)
+                m.poll.assert_called_once_with(1000)
+                m.poll.return_value = [(trigger._fd, select.POLLERR)]
+                self.assertRaises(OSError, trigger.wait)
+        self.assertRaises(ValueError, trigger.wait)
+        self.assertRaises(ValueError, trigger.fileno)
+
 
 # =====================================================================
 # system CPU
@@ -374,9 +587,543 @@ class TestSystemNetwork(unittest.TestCase):
         orig_open = open
         patch_point = 'builtins.open' if PY3 else '__builtin__.open'
         with mock.patch(patch_point, side_effect=open_mock) as m:
-            psutil.net_connections(kind='unix')
+            with mock.patch('psutil._pslinux.HAS_SOCK_DIAG', False):
+                psutil.net_connections(kind='unix')
+                assert m.called
+                # the summary goes through the same parser
+                self.assertEqual(
+                    psutil.net_connections_summary('unix', 'type'),
+                    {socket.SOCK_STREAM: 2})
+
+    @unittest.skipUnless(getattr(psutil._psplatform, 'HAS_SOCK_DIAG', False),
+                         "NETLINK_SOCK_DIAG not supported")
+    def test_net_connections_sock_diag(self):
+        # sock_diag and /proc/net/* are supposed to return the same
+        # connections
+        def by_laddr(cons):
+            return dict([(c.laddr, c) for c in cons if c.laddr])
+
+        tcp = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.addCleanup(tcp.close)
+        tcp.bind(('127.0.0.1', 0))
+        tcp.listen(1)
+        udp = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.addCleanup(udp.close)
+        udp.bind(('127.0.0.1', 0))
+        p = psutil.Process()
+        for kind in ('tcp4', 'udp4', 'unix'):
+            with mock.patch('psutil._pslinux.open', create=True) as m:
+                diag = p.connections(kind=kind)
+                assert not m.called
+            with mock.patch('psutil._pslinux.HAS_SOCK_DIAG', False):
+                procfs = p.connections(kind=kind)
+            self.assertEqual(by_laddr(diag), by_laddr(procfs))
+        cons = by_laddr(p.connections(kind='inet4'))
+        self.assertEqual(cons[tcp.getsockname()].status, psutil.CONN_LISTEN)
+        self.assertEqual(cons[udp.getsockname()].status, psutil.CONN_NONE)
+
+    @unittest.skipUnless(getattr(psutil._psplatform, 'HAS_SOCK_DIAG', False),
+                         "NETLINK_SOCK_DIAG not supported")
+    def test_net_connections_filters(self):
+        # kernel-side (sock_diag bytecode) and /proc/net/* filters are
+        # supposed to return the same connections
+        server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.addCleanup(server.close)
+        server.bind(('127.0.0.1', 0))
+        server.listen(1)
+        client = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.addCleanup(client.close)
+        client.connect(server.getsockname())
+        port = server.getsockname()[1]
+        for kwargs in (dict(lport=port),
+                       dict(rport=port),
+                       dict(lport=port, status=psutil.CONN_LISTEN),
+                       dict(lport=client.getsockname()[1], rport=port),
+                       dict(status=[psutil.CONN_LISTEN, psutil.CONN_NONE]),
+                       dict(pid=os.getpid())):
+            diag = psutil.net_connections('inet', **kwargs)
+            with mock.patch('psutil._pslinux.HAS_SOCK_DIAG', False):
+                procfs = psutil.net_connections('inet', **kwargs)
+            self.assertEqual(sorted(diag), sorted(procfs))
+            assert diag, kwargs
+
+    @unittest.skipUnless(getattr(psutil._psplatform, 'HAS_SOCK_DIAG', False),
+                         "NETLINK_SOCK_DIAG not supported")
+    def test_net_connections_extended_unix(self):
+        a, b = socket.socketpair()
+        self.addCleanup(a.close)
+        self.addCleanup(b.close)
+        a.send(b"hello")
+        cons = dict([(c.fd, c) for c in psutil.net_connections(
+            kind='unix', pid=os.getpid(), extended=True)])
+        ca, cb = cons[a.fileno()], cons[b.fileno()]
+        self.assertEqual(ca.peer_inode, cb.inode)
+        self.assertEqual(cb.peer_inode, ca.inode)
+        self.assertEqual(ca.peer_pid, os.getpid())
+        self.assertEqual(cb.peer_pid, os.getpid())
+        self.assertEqual(cb.rqueue, 5)
+        self.assertEqual(ca.rqueue, 0)
+        # /proc/net/unix provides no peer and queues
+        with mock.patch('psutil._pslinux.HAS_SOCK_DIAG', False):
+            cons = dict([(c.fd, c) for c in psutil.net_connections(
+                kind='unix', pid=os.getpid(), extended=True)])
+        ca = cons[a.fileno()]
+        self.assertIsNone(ca.peer_inode)
+        self.assertIsNone(ca.peer_pid)
+        self.assertIsNone(ca.rqueue)
+        self.assertIsNone(ca.wqueue)
+
+    def test_net_connections_extended_inet(self):
+        server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.addCleanup(server.close)
+        server.bind(('127.0.0.1', 0))
+        server.listen(1)
+        client = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.addCleanup(client.close)
+        client.connect(server.getsockname())
+        conn = server.accept()[0]
+        self.addCleanup(conn.close)
+        client.send(b"hello")
+        time.sleep(0.1)
+        for has_diag in (psutil._pslinux.HAS_SOCK_DIAG, False):
+            with mock.patch('psutil._pslinux.HAS_SOCK_DIAG', has_diag):
+                cons = psutil.net_connections(
+                    kind='tcp4', pid=os.getpid(), extended=True)
+            cons = dict([(c.fd, c) for c in cons])
+            self.assertEqual(cons[conn.fileno()].rqueue, 5)
+            self.assertEqual(cons[client.fileno()].rqueue, 0)
+            self.assertIsNone(cons[conn.fileno()].peer_inode)
+            self.assertIsNone(cons[conn.fileno()].peer_pid)
+            assert cons[conn.fileno()].inode > 0
+            self.assertEqual(cons[conn.fileno()].retransmits, 0)
+            assert cons[conn.fileno()].cwnd > 0
+            if has_diag:
+                assert cons[client.fileno()].rtt > 0
+                assert cons[client.fileno()].rttvar > 0
+            else:
+                self.assertIsNone(cons[client.fileno()].rtt)
+
+    def test_net_connections_extended_udp(self):
+        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.addCleanup(sock.close)
+        sock.bind(('127.0.0.1', 0))
+        for has_diag in (psutil._pslinux.HAS_SOCK_DIAG, False):
+            with mock.patch('psutil._pslinux.HAS_SOCK_DIAG', has_diag):
+                cons = psutil.net_connections(
+                    kind='udp4', lport=sock.getsockname()[1], extended=True)
+            self.assertEqual(len(cons), 1)
+            for name in ('rtt', 'rttvar', 'retransmits', 'cwnd'):
+                self.assertIsNone(getattr(cons[0], name))
+
+    def test_iter_connections_unique(self):
+        # unnamed UNIX sockets whose owner is unknown look the same
+        def open_mock(name, *args, **kwargs):
+            if name == '/proc/net/unix':
+                return io.StringIO(textwrap.dedent(u"""\
+                    Num RefCount Protocol Flags Type St Inode Path
+                    0: 00000003 000 000 0001 03 111111
+                    0: 00000003 000 000 0001 03 222222
+                    0: 00000003 000 000 0001 03 333333 /tmp/foo
+                    """))
+            else:
+                return orig_open(name, *args, **kwargs)
+
+        orig_open = open
+        patch_point = 'builtins.open' if PY3 else '__builtin__.open'
+        with mock.patch(patch_point, side_effect=open_mock):
+            with mock.patch('psutil._pslinux.HAS_SOCK_DIAG', False):
+                cons = list(psutil.iter_connections(kind='unix'))
+                self.assertEqual(len(cons), 3)
+                cons = list(psutil.iter_connections(kind='unix',
+                                                    unique=True))
+                self.assertEqual(sorted([c.laddr for c in cons]),
+                                 ['', '/tmp/foo'])
+                self.assertEqual(len(psutil.net_connections(kind='unix')),
+                                 2)
+
+    def test_net_connections_filters_mocked(self):
+        # filters are supposed to be applied before decoding addresses
+        def open_mock(name, *args, **kwargs):
+            if name == '/proc/net/tcp':
+                return io.StringIO(textwrap.dedent(u"""\
+                    sl local_address rem_address st tx_queue rx_queue tr tm->when retrnsmt   uid  timeout inode
+                    0: 0100007F:0050 00000000:0000 0A 00000000:00000000 00:00000000 00000000 0 0 1
+                    1: 0100007F:0051 0100007F:D431 01 00000000:00000000 00:00000000 00000000 0 0 2
+                    """))  # NOQA
+            elif name in ('/proc/net/tcp6', '/proc/net/udp',
+                          '/proc/net/udp6'):
+                return io.StringIO(textwrap.dedent(u"""\
+                    sl local_address rem_address st tx_queue rx_queue tr tm->when retrnsmt   uid  timeout inode
+                    """))  # NOQA
+            else:
+                return orig_open(name, *args, **kwargs)
+
+        orig_open = open
+        patch_point = 'builtins.open' if PY3 else '__builtin__.open'
+        with mock.patch(patch_point, side_effect=open_mock):
+            with mock.patch('psutil._pslinux.HAS_SOCK_DIAG', False):
+                with mock.patch('psutil._pslinux.Connections.decode_address',
+                                autospec=True, side_effect=psutil._pslinux.
+                                Connections.decode_address) as m:
+                    cons = psutil.net_connections(
+                        'inet', status=psutil.CONN_LISTEN)
+                    self.assertEqual([c.laddr for c in cons],
+                                     [('127.0.0.1', 80)])
+                    self.assertEqual(m.call_count, 2)
+                    m.reset_mock()
+                    cons = psutil.net_connections('inet', rport=54321)
+                    self.assertEqual([c.laddr for c in cons],
+                                     [('127.0.0.1', 81)])
+                    self.assertEqual(m.call_count, 2)
+
+    def test_connection_table(self):
+        server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.addCleanup(server.close)
+        server.bind(('127.0.0.1', 0))
+        server.listen(1)
+
+        def to_conns(table):
+            ret = set()
+            for i in range(len(table)):
+                family = table.family[i]
+                laddr = bytes(table.laddr[i * 16:(i + 1) * 16])
+                raddr = bytes(table.raddr[i * 16:(i + 1) * 16])
+                if family == socket.AF_INET:
+                    laddr, raddr = laddr[12:], raddr[12:]
+                laddr = (socket.inet_ntop(family, laddr), table.lport[i]) \
+                    if table.lport[i] else ()
+                raddr = (socket.inet_ntop(family, raddr), table.rport[i]) \
+                    if table.rport[i] else ()
+                pid = table.pid[i] if table.pid[i] != -1 else None
+                ret.add(psutil._common.sconn(
+                    table.fd[i], family, table.type[i], laddr, raddr,
+                    table.statuses[table.status[i]], pid))
+            return ret
+
+        for backend in (True, False):
+            with mock.patch('psutil._pslinux.HAS_SOCK_DIAG',
+                            backend and psutil._pslinux.HAS_SOCK_DIAG):
+                table = psutil.connection_table('inet')
+                cons = psutil.net_connections('inet')
+            self.assertEqual(to_conns(table), set(cons))
+            self.assertIn(server.getsockname(),
+                          [c.laddr for c in to_conns(table)])
+            self.assertEqual(len(table.laddr), len(table) * 16)
+        self.assertRaises(ValueError, psutil.connection_table, 'unix')
+        self.assertRaises(ValueError, psutil.connection_table, '???')
+
+    @unittest.skipIf(numpy is None, "numpy module not available")
+    def test_connection_table_as_numpy(self):
+        table = psutil.connection_table('inet')
+        arrays = table.as_numpy()
+        self.assertEqual(arrays['lport'].tolist(), table.lport.tolist())
+        self.assertEqual(arrays['laddr'].shape, (len(table), 16))
+
+    def test_inode_index(self):
+        index = psutil._pslinux.InodeIndex()
+        procfs_path = psutil.PROCFS_PATH
+        pid = os.getpid()
+        with mock.patch('psutil._pslinux.pids', return_value=[pid]):
+            index.snapshot(procfs_path)
+            sock = socket.socket()
+            self.addCleanup(sock.close)
+            inode = str(os.fstat(sock.fileno()).st_ino)
+            with mock.patch('psutil._pslinux.readlink',
+                            side_effect=psutil._pslinux.readlink) as m:
+                view = index.snapshot(procfs_path)
+                self.assertIn(inode, view)
+                self.assertEqual(view[inode], ((pid, sock.fileno()), ))
+                # only new fds are supposed to be read
+                self.assertLess(m.call_count, psutil.Process().num_fds())
+            # a socket replacing another one using the same fd number
+            # is found by rescanning all fds
+            sock2 = socket.socket()
+            os.dup2(sock2.fileno(), sock.fileno())
+            sock2.close()
+            view = index.snapshot(procfs_path)
+            old_inode = inode
+            inode = str(os.fstat(sock.fileno()).st_ino)
+            self.assertIn(inode, view)
+            self.assertEqual(view[inode], ((pid, sock.fileno()), ))
+            self.assertNotIn(old_inode, view)
+            # a socket moving to another fd, its old fd being taken
+            # over by a file
+            fd = os.dup(sock.fileno())
+            with open(__file__) as f:
+                os.dup2(f.fileno(), sock.fileno())
+            view = index.snapshot(procfs_path)
+            self.assertEqual(view[inode], ((pid, fd), ))
+            # closed sockets go away on rescan
+            os.close(fd)
+            index.repair()
+            self.assertNotIn(inode, index._inodes)
+        # processes which are gone are removed from the index
+        with mock.patch('psutil._pslinux.pids', return_value=[]):
+            index.snapshot(procfs_path)
+            self.assertEqual(index._inodes, {})
+
+    def test_net_namespaces(self):
+        pid = os.getpid()
+        nss = psutil.net_namespaces()
+        ns = os.stat('/proc/self/ns/net').st_ino
+        self.assertIn(pid, nss[ns])
+        self.assertEqual(sum([len(x) for x in nss.values()]),
+                         len(set(sum(nss.values(), []))))
+
+    def test_net_connections_pid_errors(self):
+        # nonexistent PID
+        self.assertEqual(psutil.net_connections(pid=2 ** 31 - 1), [])
+        self.assertEqual(list(psutil.iter_connections(pid=2 ** 31 - 1)), [])
+        # fds can't be read
+        sproc = get_test_subprocess()
+        self.addCleanup(reap_children)
+        exc = OSError(errno.EACCES, "")
+        with mock.patch('psutil._pslinux.os.listdir', side_effect=exc):
+            self.assertEqual(psutil.net_connections(pid=sproc.pid), [])
+            self.assertEqual(
+                list(psutil.iter_connections(pid=sproc.pid)), [])
+            # ...whereas Process.connections() raises
+            self.assertRaises(psutil.AccessDenied,
+                              psutil.Process(sproc.pid).connections)
+
+    def test_net_connections_netns(self):
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.addCleanup(sock.close)
+        sock.bind(('127.0.0.1', 0))
+        sock.listen(1)
+        sproc = get_test_subprocess()
+        self.addCleanup(reap_children)
+        # same namespace as ours
+        cons = psutil.net_connections('tcp4', netns=sproc.pid)
+        self.assertIn(sock.getsockname(), [x.laddr for x in cons])
+        # pretend it's another namespace: /proc/{pid}/net/* is read
+        with mock.patch('psutil._pslinux.netns_id',
+                        side_effect=lambda pid=None: pid or 0):
+            with mock.patch('psutil._pslinux.cext.net_connections_inet',
+                            create=True) as m1:
+                with mock.patch('psutil._pslinux.open', create=True,
+                                side_effect=open) as m2:
+                    cons2 = psutil.net_connections('tcp4', netns=sproc.pid)
+                    assert not m1.called
+                    self.assertIn('/proc/%s/net/tcp' % sproc.pid,
+                                  [x[0][0] for x in m2.call_args_list])
+        self.assertEqual(sorted(cons), sorted(cons2))
+        self.assertRaises(psutil.NoSuchProcess, psutil.net_connections,
+                          netns=2 ** 31 - 1)
+
+    def test_iter_connections_netns_interleaved(self):
+        # a lazily consumed generator keeps reading from the namespace
+        # it was created for, whatever other calls happen meanwhile
+        sproc = get_test_subprocess()
+        self.addCleanup(reap_children)
+        with mock.patch('psutil._pslinux.HAS_SOCK_DIAG', False):
+            with mock.patch('psutil._pslinux.open', create=True,
+                            side_effect=open) as m:
+                g1 = psutil.iter_connections('tcp4', netns=sproc.pid)
+                g2 = psutil.iter_connections('tcp4')
+                psutil.net_connections('tcp4')
+                m.reset_mock()
+                list(g1)
+                self.assertEqual(m.call_args[0][0],
+                                 '/proc/%s/net/tcp' % sproc.pid)
+                m.reset_mock()
+                list(g2)
+                self.assertEqual(m.call_args[0][0], '/proc/net/tcp')
+
+    def test_net_io_counters_netns(self):
+        sproc = get_test_subprocess()
+        self.addCleanup(reap_children)
+        with mock.patch('psutil._pslinux.open', create=True,
+                        side_effect=open) as m:
+            nics = psutil.net_io_counters(pernic=True, netns=sproc.pid)
+            self.assertEqual(m.call_args[0][0],
+                             '/proc/%s/net/dev' % sproc.pid)
+        self.assertEqual(sorted(nics), sorted(psutil.net_io_counters(True)))
+        self.assertRaises(psutil.NoSuchProcess, psutil.net_io_counters,
+                          netns=2 ** 31 - 1)
+
+    def test_net_io_counters_netlink(self):
+        # RTM_GETLINK and /proc/net/dev are supposed to return the
+        # same NICs and (about the same) counters
+        with mock.patch('psutil._pslinux.open', create=True) as m:
+            netlink = psutil.net_io_counters(pernic=True)
+            assert not m.called
+        with mock.patch('psutil._pslinux.HAS_NET_IF_LINKS', False):
+            procfs = psutil.net_io_counters(pernic=True)
+        self.assertEqual(sorted(netlink), sorted(procfs))
+        for name in netlink:
+            for x, y in zip(netlink[name], procfs[name]):
+                self.assertAlmostEqual(x, y, delta=1024 * 1024)
+
+    def test_net_if_links(self):
+        links = psutil.net_if_links()
+        stats = psutil.net_if_stats()
+        self.assertEqual(sorted(links), sorted(stats))
+        for name, link in links.items():
+            self.assertEqual(link.isup, stats[name].isup)
+            self.assertEqual(link.mtu, stats[name].mtu)
+            for value in link[2:]:
+                self.assertIsInstance(value, (int, long))
+                assert value >= 0, link
+        with mock.patch('psutil._pslinux.cext.net_if_links',
+                        side_effect=OSError(errno.EPERM, "")) as m:
+            assert psutil.net_io_counters()
             assert m.called
 
+    def test_net_if_stats_batched(self):
+        # the batched implementation is supposed to return the same
+        # results as one ioctl() per NIC
+        nics = psutil.net_if_stats()
+        for name, stats in nics.items():
+            isup, duplex, speed, mtu = psutil._psplatform.cext.net_if_stats(
+                name)
+            self.assertEqual(stats.isup, isup)
+            self.assertEqual(stats.speed, speed)
+            self.assertEqual(stats.mtu, mtu)
+        with mock.patch('psutil._pslinux.cext.net_if_links',
+                        side_effect=OSError(errno.EPERM, "")):
+            self.assertEqual(psutil.net_if_stats(), nics)
+
+    def test_net_if_cached(self):
+        self.assertEqual(psutil.net_if_addrs(cached=True),
+                         psutil.net_if_addrs())
+        self.assertEqual(psutil.net_if_stats(cached=True),
+                         psutil.net_if_stats())
+        # returned dicts are copies
+        psutil.net_if_addrs(cached=True).clear()
+        assert psutil.net_if_addrs(cached=True)
+
+    def test_netlink_cache(self):
+        cache = psutil._pslinux.NetlinkCache(
+            psutil._pslinux.RTMGRP_LINK)
+        self.addCleanup(cache.close)
+        fun = mock.Mock(return_value=1)
+        self.assertEqual(cache.get(fun), 1)
+        self.assertEqual(cache.get(fun), 1)
+        self.assertEqual(fun.call_count, 1)
+        if cache._sock is None:
+            raise unittest.SkipTest("NETLINK_ROUTE socket not available")
+        # a notification arrives
+        sock = cache._sock
+        with mock.patch.object(cache, '_sock') as m:
+            m.recv.side_effect = [b"x" * 16,
+                                  socket.error(errno.EAGAIN, "")]
+            cache.get(fun)
+        self.assertEqual(fun.call_count, 2)
+        cache._sock = sock
+        cache.get(fun)
+        self.assertEqual(fun.call_count, 2)
+        # forked
+        with mock.patch('psutil._pslinux.os.getpid', return_value=-1):
+            cache.get(fun)
+        self.assertEqual(fun.call_count, 3)
+
+    def test_net_if_stats_cache_ttl(self):
+        psutil._pslinux._nic_speed_cache.clear()
+        orig = psutil._pslinux.cext.net_if_duplex_speed
+        with mock.patch('psutil._pslinux.cext.net_if_duplex_speed',
+                        side_effect=orig) as m:
+            first = psutil.net_if_stats(cache_ttl=60)
+            self.assertEqual(m.call_count, 1)
+            self.assertEqual(psutil.net_if_stats(cache_ttl=60), first)
+            self.assertEqual(m.call_count, 1)
+            # no caching
+            psutil.net_if_stats()
+            self.assertEqual(m.call_count, 2)
+            # expired
+            with mock.patch('psutil._pslinux._timer',
+                            return_value=psutil._pslinux._timer() + 61):
+                psutil.net_if_stats(cache_ttl=60)
+            self.assertEqual(m.call_count, 3)
+
+    def test_net_connections_summary(self):
+        from psutil._common import summarize_connections
+        server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.addCleanup(server.close)
+        server.bind(('127.0.0.1', 0))
+        server.listen(1)
+        for has_diag in (psutil._pslinux.HAS_SOCK_DIAG, False):
+            with mock.patch('psutil._pslinux.HAS_SOCK_DIAG', has_diag):
+                for group_by in (('pid', 'status'), 'status',
+                                 ('family', 'type', 'lport', 'rport')):
+                    self.assertEqual(
+                        psutil.net_connections_summary('inet', group_by),
+                        summarize_connections(
+                            psutil.net_connections('inet'), group_by))
+                # addresses are never decoded and processes are not
+                # looked at unless needed
+                with mock.patch('psutil._pslinux.Connections.'
+                                'decode_address') as m1:
+                    with mock.patch('psutil._pslinux.Connections.'
+                                    'get_all_inodes') as m2:
+                        summary = psutil.net_connections_summary(
+                            'all', ('status', 'lport'))
+                        self.assertIn(
+                            (psutil.CONN_LISTEN, server.getsockname()[1]),
+                            summary)
+                        assert not m1.called
+                        assert not m2.called
+
+    def test_pid_for_port(self):
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.addCleanup(sock.close)
+        sock.bind(('127.0.0.1', 0))
+        sock.listen(1)
+        port = sock.getsockname()[1]
+        for has_diag in (psutil._pslinux.HAS_SOCK_DIAG, False):
+            with mock.patch('psutil._pslinux.HAS_SOCK_DIAG', has_diag):
+                # processes are looked at only until the socket is found
+                with mock.patch('psutil._pslinux.pids',
+                                return_value=[os.getpid(), 0]) as m:
+                    with mock.patch('psutil._pslinux.InodeIndex._has_link',
+                                    side_effect=psutil._pslinux.InodeIndex.
+                                    _has_link) as m2:
+                        self.assertEqual(psutil.pid_for_port(port),
+                                         os.getpid())
+                        if m.called:
+                            self.assertEqual(m2.call_count, 1)
+                self.assertIsNone(
+                    psutil.pid_for_port(port, status=psutil.CONN_CLOSE))
+        # the owner known by the index is checked first
+        psutil.net_connections()
+        with mock.patch('psutil._pslinux.pids') as m:
+            self.assertEqual(psutil.pid_for_port(port), os.getpid())
+            assert not m.called
+        self.assertRaises(ValueError, psutil.pid_for_port, port, kind='unix')
+
+    @unittest.skipUnless(sys.byteorder == 'little', "little endian only")
+    def test_decode_address(self):
+        conns = psutil._pslinux.Connections()
+        self.assertEqual(
+            conns.decode_address("0500000A:0016", socket.AF_INET),
+            ("10.0.0.5", 22))
+        self.assertEqual(
+            conns.decode_address("0000000000000000FFFF00000100007F:9E49",
+                                 socket.AF_INET6),
+            ("::ffff:127.0.0.1", 40521))
+        self.assertEqual(
+            conns.decode_address("0500000A:0000", socket.AF_INET), ())
+        # decoded IPs are cached
+        hits = psutil._pslinux._decode_ip.cache_info().hits
+        conns.decode_address("0500000A:0017", socket.AF_INET)
+        self.assertEqual(psutil._pslinux._decode_ip.cache_info().hits,
+                         hits + 1)
+
+    def test_net_connections_sock_diag_unsupported(self):
+        # in case NETLINK_SOCK_DIAG fails we fall back on /proc/net/*
+        with mock.patch('psutil._pslinux.cext.net_connections_inet',
+                        side_effect=OSError(errno.ENOENT, ""),
+                        create=True) as m1:
+            with mock.patch('psutil._pslinux.cext.net_connections_unix',
+                            side_effect=OSError(errno.EACCES, ""),
+                            create=True) as m2:
+                with mock.patch('psutil._pslinux.open', create=True,
+                                side_effect=open) as m3:
+                    psutil.net_connections(kind='all')
+                    assert m1.called or not psutil._pslinux.HAS_SOCK_DIAG
+                    assert m2.called or not psutil._pslinux.HAS_SOCK_DIAG
+                    assert m3.called
+
 
 # =====================================================================
 # system disk
@@ -424,17 +1171,84 @@ class TestSystemDisks(unittest.TestCase):
                 self.fail("couldn't find any ZFS partition")
         else:
             # No ZFS partitions on this system. Let's fake one.
-            fake_file = io.StringIO(u("nodev\tzfs\n"))
-            with mock.patch('psutil._pslinux.open',
-                            return_value=fake_file, create=True) as m1:
-                with mock.patch(
-                        'psutil._pslinux.cext.disk_partitions',
-                        return_value=[('/dev/sdb3', '/', 'zfs', 'rw')]) as m2:
-                    ret = psutil.disk_partitions()
-                    assert m1.called
-                    assert m2.called
-                    assert ret
-                    self.assertEqual(ret[0].fstype, 'zfs')
+            def open_mock(name, *args, **kwargs):
+                if name == '/proc/filesystems':
+                    return io.StringIO(u("nodev\tzfs\n"))
+                elif name == '/proc/self/mountinfo':
+                    return io.StringIO(
+                        u("40 1 0:42 / / rw - zfs /dev/sdb3 rw\n"))
+                else:
+                    return orig_open(name, *args, **kwargs)
+
+            orig_open = open
+            psutil._pslinux.mounts_cache.close()
+            with mock.patch('psutil._pslinux.open', side_effect=open_mock,
+                            create=True) as m:
+                ret = psutil.disk_partitions()
+                assert m.called
+                assert ret
+                self.assertEqual(ret[0].fstype, 'zfs')
+            psutil._pslinux.mounts_cache.close()
+
+    def test_disk_partitions_mountinfo(self):
+        def open_mock(name, *args, **kwargs):
+            if name == '/proc/filesystems':
+                return io.StringIO(u("\text4\nnodev\ttmpfs\n"))
+            elif name == '/proc/self/mountinfo':
+                return io.StringIO(textwrap.dedent(u("""\
+                    36 1 98:0 / / rw,noatime shared:1 - ext4 /dev/sda1 rw,errors=remount-ro
+                    37 36 98:1 /data /mnt/my\\040disk ro,relatime - ext4 /dev/sdb1 rw
+                    38 36 0:22 / /dev/shm rw master:2 shared:3 - tmpfs none rw,size=10k
+                    """)))  # NOQA
+            else:
+                return orig_open(name, *args, **kwargs)
+
+        orig_open = open
+        psutil._pslinux.mounts_cache.close()
+        with mock.patch('psutil._pslinux.open', side_effect=open_mock,
+                        create=True):
+            ret = psutil.disk_partitions(extended=True)
+            self.assertEqual(len(ret), 2)
+            self.assertEqual(ret[0][:4], ('/dev/sda1', '/', 'ext4',
+                                          'rw,noatime,errors=remount-ro'))
+            self.assertEqual(ret[0].mount_id, 36)
+            self.assertEqual(ret[0].parent_id, 1)
+            self.assertEqual(ret[0].major, 98)
+            self.assertEqual(ret[0].minor, 0)
+            self.assertEqual(ret[0].propagation, ('shared:1', ))
+            self.assertEqual(ret[1].mountpoint, '/mnt/my disk')
+            self.assertEqual(ret[1].root, '/data')
+            self.assertEqual(ret[1].opts, 'ro,relatime')
+            self.assertEqual(ret[1].propagation, ())
+            ret = psutil.disk_partitions(all=True, extended=True)
+            self.assertEqual(ret[2].device, '')
+            self.assertEqual(ret[2].propagation, ('master:2', 'shared:3'))
+        psutil._pslinux.mounts_cache.close()
+
+    def test_disk_partitions_cache(self):
+        # mountinfo is parsed again only when poll() on
+        # /proc/self/mounts signals a change
+        cache = psutil._pslinux.MountsCache()
+        self.addCleanup(cache.close)
+        fun = mock.Mock(return_value=[1])
+        self.assertEqual(cache.get(fun), [1])
+        if cache._file is None:
+            raise unittest.SkipTest("can't poll /proc/self/mounts")
+        self.assertEqual(cache.get(fun), [1])
+        self.assertEqual(fun.call_count, 1)
+        cache.get(fun, True)
+        self.assertEqual(fun.call_count, 2)
+        poller = cache._poller
+        cache._poller = mock.Mock()
+        cache._poller.poll.return_value = [(3, select.POLLPRI)]
+        cache.get(fun)
+        cache._poller = poller
+        self.assertEqual(fun.call_count, 3)
+        # real partitions come from mountinfo, the same as getmntent()
+        self.assertEqual(
+            psutil.disk_partitions(all=True),
+            [psutil._common.sdiskpart(*x) for x in
+             psutil._pslinux.cext.disk_partitions()])
 
     def test_disk_io_counters_kernel_2_4_mocked(self):
         # Tests /proc/diskstats parsing format for 2.4 kernels, see:
@@ -499,7 +1313,72 @@ class TestSystemDisks(unittest.TestCase):
             self.assertEqual(ret.write_merged_count, 6)
             self.assertEqual(ret.write_bytes, 7 * SECTOR_SIZE)
             self.assertEqual(ret.write_time, 8)
+            self.assertEqual(ret.in_flight, 9)
+            self.assertEqual(ret.busy_time, 10)
+            self.assertEqual(ret.weighted_time, 11)
+
+    def test_disk_io_counters_discard_flush_mocked(self):
+        # Linux 4.18+ adds 4 discard fields, Linux 5.5+ 2 flush fields
+        def open_mock(name, *args, **kwargs):
+            if name == '/proc/partitions':
+                return io.StringIO(textwrap.dedent(u"""\
+                    major minor  #blocks  name
+
+                       8        0  488386584 hda
+                       8       16  488386584 hdb
+                    """))
+            elif name == '/proc/diskstats':
+                return io.StringIO(textwrap.dedent(u"""\
+                       3    0   hda 1 2 3 4 5 6 7 8 9 10 11 12 13 14 15
+                       3   16   hdb 1 2 3 4 5 6 7 8 9 10 11 12 13 14 15 16 17
+                    """))
+            else:
+                return orig_open(name, *args, **kwargs)
+
+        orig_open = open
+        patch_point = 'builtins.open' if PY3 else '__builtin__.open'
+        with mock.patch(patch_point, side_effect=open_mock):
+            ret = psutil.disk_io_counters(perdisk=True)
+        for disk in ('hda', 'hdb'):
+            self.assertEqual(ret[disk].read_count, 1)
+            self.assertEqual(ret[disk].write_bytes, 7 * SECTOR_SIZE)
+            self.assertEqual(ret[disk].weighted_time, 11)
+            self.assertEqual(ret[disk].discard_count, 12)
+            self.assertEqual(ret[disk].discard_merged_count, 13)
+            self.assertEqual(ret[disk].discard_bytes, 14 * SECTOR_SIZE)
+            self.assertEqual(ret[disk].discard_time, 15)
+        self.assertEqual(ret['hda'].flush_count, 0)
+        self.assertEqual(ret['hda'].flush_time, 0)
+        self.assertEqual(ret['hdb'].flush_count, 16)
+        self.assertEqual(ret['hdb'].flush_time, 17)
+
+    def test_disk_io_counters_disks(self):
+        # selected disks are read from /sys/class/block/<disk>/stat
+        def open_mock(name, *args, **kwargs):
+            if name == '/sys/class/block/hda/stat':
+                return io.BytesIO(b"1 2 3 4 5 6 7 8 9 10 11 12 13 14 15\n")
+            elif name == '/sys/class/block/hda1/stat':
+                return io.BytesIO(b"1 2 3 4\n")
+            elif name.startswith('/sys/class/block/'):
+                raise IOError(errno.ENOENT, "")
+            elif name == '/proc/diskstats':
+                raise AssertionError("/proc/diskstats was read")
+            else:
+                return orig_open(name, *args, **kwargs)
+
+        orig_open = open
+        patch_point = 'builtins.open' if PY3 else '__builtin__.open'
+        with mock.patch(patch_point, side_effect=open_mock):
+            ret = psutil.disk_io_counters(
+                perdisk=True, disks=['hda', 'hda1', 'foo'])
+            self.assertEqual(sorted(ret), ['hda', 'hda1'])
+            self.assertEqual(ret['hda'].read_count, 1)
+            self.assertEqual(ret['hda'].discard_time, 15)
+            self.assertEqual(ret['hda1'].write_bytes, 4 * SECTOR_SIZE)
+            ret = psutil.disk_io_counters(disks='hda')
             self.assertEqual(ret.busy_time, 10)
+            self.assertRaises(RuntimeError, psutil.disk_io_counters,
+                              disks=['foo'])
 
     def test_disk_io_counters_kernel_2_6_limited_mocked(self):
         # Tests /proc/diskstats parsing format for 2.6 kernels,
@@ -537,6 +1416,151 @@ class TestSystemDisks(unittest.TestCase):
             self.assertEqual(ret.write_time, 0)
             self.assertEqual(ret.busy_time, 0)
 
+    def test_disk_io_counters_partitions_cache(self):
+        # /proc/partitions is read again only if disks listed in
+        # /proc/diskstats change
+        def open_mock(name, *args, **kwargs):
+            if name == '/proc/partitions':
+                return io.StringIO(textwrap.dedent(u"""\
+                    major minor  #blocks  name
+
+                       8        0  488386584 hda
+                       8        0  488386584 hdb
+                    """))
+            elif name == '/proc/diskstats':
+                return io.StringIO(u(diskstats))
+            else:
+                return orig_open(name, *args, **kwargs)
+
+        def partitions_reads():
+            return [x for x in m.call_args_list
+                    if x[0][0] == '/proc/partitions']
+
+        orig_open = open
+        diskstats = "   3    0   hda 1 2 3 4 5 6 7 8 9 10 11"
+        patch_point = 'builtins.open' if PY3 else '__builtin__.open'
+        psutil._pslinux._partitions_cache.clear()
+        with mock.patch(patch_point, side_effect=open_mock) as m:
+            self.assertEqual(list(psutil.disk_io_counters(True)), ['hda'])
+            self.assertEqual(list(psutil.disk_io_counters(True)), ['hda'])
+            self.assertEqual(len(partitions_reads()), 1)
+            # a new disk appears
+            diskstats += "\n   3    0   hdb 1 2 3 4 5 6 7 8 9 10 11"
+            self.assertEqual(sorted(psutil.disk_io_counters(True)),
+                             ['hda', 'hdb'])
+            self.assertEqual(len(partitions_reads()), 2)
+
+    def _make_sysfs_block(self, root):
+        # build a fake /sys/class/block: nvme0n1 with one partition,
+        # an LVM volume on top of it and a RAID1 array
+        devices = os.path.join(root, 'devices')
+        block = os.path.join(root, 'block')
+        tree = {
+            'nvme0n1': {'holders': [], 'slaves': []},
+            'nvme0n1/nvme0n1p1': {'holders': ['dm-0', 'md127'],
+                                  'partition': '1'},
+            'dm-0': {'holders': [], 'slaves': ['nvme0n1p1'],
+                     'dm/name': 'vg0-root', 'dm/uuid': 'LVM-abcd'},
+            'md127': {'holders': [], 'slaves': ['nvme0n1p1'],
+                      'md/level': 'raid1'},
+        }
+        os.mkdir(block)
+        for path, entries in tree.items():
+            devpath = os.path.join(devices, path)
+            os.makedirs(devpath)
+            for entry, value in entries.items():
+                if isinstance(value, list):
+                    os.mkdir(os.path.join(devpath, entry))
+                    for x in value:
+                        open(os.path.join(devpath, entry, x), 'w').close()
+                else:
+                    dirname = os.path.dirname(os.path.join(devpath, entry))
+                    if not os.path.isdir(dirname):
+                        os.mkdir(dirname)
+                    with open(os.path.join(devpath, entry), 'w') as f:
+                        f.write(value + '\n')
+            os.symlink(devpath, os.path.join(block, os.path.basename(path)))
+        return block
+
+    def test_disk_topology(self):
+        root = tempfile.mkdtemp()
+        try:
+            block = self._make_sysfs_block(root)
+            psutil._pslinux._topology_cache.clear()
+            with mock.patch('psutil._pslinux.BLOCK_SYSFS_PATH', block):
+                ret = psutil.disk_topology()
+                self.assertEqual(
+                    ret['nvme0n1'], ('nvme0n1', 'disk', (), ('nvme0n1p1', )))
+                self.assertEqual(
+                    ret['nvme0n1p1'],
+                    ('nvme0n1p1', 'part', ('nvme0n1', ), ('dm-0', 'md127')))
+                self.assertEqual(
+                    ret['dm-0'], ('vg0-root', 'lvm', ('nvme0n1p1', ), ()))
+                self.assertEqual(ret['md127'].type, 'raid1')
+                self.assertEqual(ret['md127'].parents, ('nvme0n1p1', ))
+                # cached until block devices change
+                with mock.patch('psutil._pslinux._read_sysfs') as m:
+                    self.assertEqual(psutil.disk_topology(), ret)
+                    assert not m.called
+                    os.remove(os.path.join(block, 'md127'))
+                    psutil.disk_topology()
+                    assert m.called
+                # nvme0n1 is a disk even if its name ends with a digit
+                assert not psutil._pslinux.is_partition('nvme0n1')
+                assert psutil._pslinux.is_partition('nvme0n1p1')
+        finally:
+            shutil.rmtree(root)
+            psutil._pslinux._topology_cache.clear()
+
+    def test_disk_io_stats(self):
+        def nt(*args):
+            args += (0, ) * (len(psutil._pslinux.sdiskio._fields) - len(args))
+            return psutil._pslinux.sdiskio(*args)
+
+        samples = [
+            {'sda': nt(100, 50, 4096, 8192, 200, 300, 0, 0, 1000, 3, 4000)},
+            {'sda': nt(300, 60, 8192, 9216, 1200, 800, 0, 0, 1500, 1, 6000)},
+        ]
+        tracker = psutil.RateTracker(lambda: samples.pop(0))
+        with mock.patch('psutil._timer', side_effect=[10.0, 12.0]):
+            ret = psutil.disk_io_stats(sampler=tracker)
+            self.assertEqual(ret['sda'].util, 0)
+            ret = psutil.disk_io_stats(sampler=tracker)['sda']
+        self.assertEqual(ret.read_per_sec, 100)
+        self.assertEqual(ret.write_per_sec, 5)
+        self.assertEqual(ret.read_bytes_per_sec, 2048)
+        self.assertEqual(ret.write_bytes_per_sec, 512)
+        self.assertEqual(ret.r_await, 5)
+        self.assertEqual(ret.w_await, 50)
+        self.assertEqual(ret.avgqu_sz, 1)
+        self.assertEqual(ret.util, 25)
+        self.assertEqual(ret.in_flight, 1)
+
+    def test_disk_io_stats_interval(self):
+        def open_mock(name, *args, **kwargs):
+            if name == '/proc/partitions':
+                return io.StringIO(textwrap.dedent(u"""\
+                    major minor  #blocks  name
+
+                       8        0  488386584 hda
+                    """))
+            elif name == '/proc/diskstats':
+                return io.StringIO(
+                    u("   3    0   hda 1 2 3 4 5 6 7 8 9 10 11"))
+            else:
+                return orig_open(name, *args, **kwargs)
+
+        orig_open = open
+        patch_point = 'builtins.open' if PY3 else '__builtin__.open'
+        with mock.patch(patch_point, side_effect=open_mock):
+            with mock.patch('psutil.time.sleep') as m:
+                ret = psutil.disk_io_stats(interval=0.5)
+        m.assert_called_once_with(0.5)
+        self.assertEqual(list(ret), ['hda'])
+        self.assertEqual(ret['hda'].util, 0)
+        self.assertEqual(ret['hda'].in_flight, 9)
+        self.assertRaises(ValueError, psutil.disk_io_stats, interval=0)
+
 
 # =====================================================================
 # misc
@@ -687,14 +1711,14 @@ class TestMisc(unittest.TestCase):
             os.rmdir(tdir)
 
     def test_sector_size_mock(self):
-        # Test SECTOR_SIZE fallback in case 'hw_sector_size' file
-        # does not exist.
+        # /proc/diskstats sectors are always 512 bytes long, no matter
+        # what the hardware sector size of the disk is (e.g. 4Kn).
         def open_mock(name, *args, **kwargs):
             if PY3 and isinstance(name, bytes):
                 name = name.decode()
-            if name.startswith("/sys/block/sda/queue/hw_sector_size"):
+            if name.endswith("/queue/hw_sector_size"):
                 flag.append(None)
-                raise IOError(errno.ENOENT, '')
+                return io.StringIO(u("4096"))
             else:
                 return orig_open(name, *args, **kwargs)
 
@@ -705,7 +1729,7 @@ class TestMisc(unittest.TestCase):
             with mock.patch(patch_point, side_effect=open_mock):
                 importlib.reload(psutil._pslinux)
                 importlib.reload(psutil)
-                self.assertEqual(flag, [None])
+                self.assertEqual(flag, [])
                 self.assertEqual(psutil._pslinux.SECTOR_SIZE, 512)
         finally:
             importlib.reload(psutil._pslinux)
@@ -849,6 +1873,23 @@ class TestProcess(unittest.TestCase):
                 psutil._pslinux.Process(os.getpid()).io_counters)
             assert m.called
 
+    def test_num_fds_mocked(self):
+        # num_fds() relies on st_size of /proc/{pid}/fd on Linux >= 6.2
+        # and falls back on listing the directory on older kernels.
+        # Use a child process as listing our own fd directory would
+        # temporarily open one more fd.
+        p = psutil.Process(get_test_subprocess().pid)
+        self.addCleanup(reap_children)
+        num = p.num_fds()
+        with mock.patch('psutil._pslinux.fd_dir_has_size',
+                        return_value=False) as m:
+            self.assertEqual(p.num_fds(), num)
+            assert m.called
+        with mock.patch('psutil._pslinux.os.listdir') as m:
+            if psutil._pslinux.fd_dir_has_size(psutil.PROCFS_PATH):
+                self.assertEqual(p.num_fds(), num)
+                assert not m.called
+
     def test_readlink_path_deleted_mocked(self):
         with mock.patch('psutil._pslinux.os.readlink',
                         return_value='/home/foo (deleted)'):
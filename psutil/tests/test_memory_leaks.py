@@ -414,10 +414,13 @@ class TestModuleFunctionsLeaks(Base):
     def test_disk_partitions(self):
         self.execute('disk_partitions')
 
-    @skip_if_linux()
     def test_net_io_counters(self):
         self.execute('net_io_counters')
 
+    @unittest.skipUnless(LINUX, "LINUX only")
+    def test_net_if_links(self):
+        self.execute('net_if_links')
+
     @unittest.skipIf(LINUX and not os.path.exists('/proc/diskstats'),
                      '/proc/diskstats not available on this Linux version')
     @skip_if_linux()
@@ -429,8 +432,6 @@ class TestModuleFunctionsLeaks(Base):
     def test_users(self):
         self.execute('users')
 
-    @unittest.skipIf(LINUX,
-                     "not worth being tested on Linux (pure python)")
     @unittest.skipIf(OSX and os.getuid() != 0, "need root access")
     def test_net_connections(self):
         self.execute('net_connections')
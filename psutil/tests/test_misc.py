@@ -5,6 +5,7 @@
 # found in the LICENSE file.
 
 import ast
+import collections
 import errno
 import imp
 import json
@@ -264,6 +265,59 @@ class TestMisc(unittest.TestCase):
         with mock.patch('psutil._common.stat.S_ISREG', return_value=False):
             assert not isfile_strict(this_file)
 
+    def test_counter_delta(self):
+        from psutil._common import counter_delta
+        self.assertEqual(counter_delta(10, 15), 5)
+        # 32-bit wrap
+        self.assertEqual(counter_delta(2 ** 32 - 10, 5), 15)
+        # 64-bit wrap
+        self.assertEqual(counter_delta(2 ** 64 - 10, 5), 15)
+        # reset
+        self.assertEqual(counter_delta(2 ** 40, 5), 5)
+        self.assertEqual(counter_delta(2 ** 31, 5), 5)
+
+    def test_rate_tracker(self):
+        from psutil._common import snetio
+        samples = [
+            {'eth0': snetio(*[2 ** 32 - 100] * 8),
+             'eth1': snetio(*[0] * 8)},
+            {'eth0': snetio(*[100] * 8),
+             'eth2': snetio(*[0] * 8)},
+        ]
+        times = [100.0, 102.0]
+        tracker = psutil.RateTracker(lambda: samples.pop(0))
+        with mock.patch('psutil._timer', side_effect=lambda: times.pop(0)):
+            ret = tracker.rates()
+            self.assertEqual(ret['eth0'], snetio(*[0.0] * 8))
+            self.assertEqual(sorted(ret), ['eth0', 'eth1'])
+            ret = tracker.rates()
+        self.assertEqual(sorted(ret), ['eth0', 'eth2'])
+        self.assertEqual(ret['eth0'], snetio(*[100.0] * 8))
+        self.assertEqual(ret['eth2'], snetio(*[0.0] * 8))
+        self.assertEqual(tracker.counters()['eth0'].bytes_sent, 100)
+        # independent consumers
+        tracker = psutil.RateTracker(lambda: 10)
+        self.assertEqual(tracker.rates(key='a'), 0.0)
+        self.assertEqual(tracker.rates(key='b'), 0.0)
+        self.assertIsNone(tracker.counters(key='c'))
+        tracker.reset(key='a')
+        self.assertIsNone(tracker.counters(key='a'))
+        self.assertRaises(TypeError, psutil.RateTracker, 10)
+
+    def test_rate_tracker_gauges(self):
+        nt = collections.namedtuple('nt', ['count', 'in_flight'])
+        samples = [{'sda': nt(100, 8), 'free': 1000},
+                   {'sda': nt(300, 2), 'free': 900}]
+        times = [100.0, 102.0]
+        tracker = psutil.RateTracker(lambda: samples.pop(0),
+                                     gauges=['in_flight', 'free'])
+        with mock.patch('psutil._timer', side_effect=lambda: times.pop(0)):
+            ret = tracker.rates()
+            self.assertEqual(ret, {'sda': nt(0.0, 8), 'free': 1000})
+            ret = tracker.rates()
+        # a decreasing gauge is not taken for a counter reset
+        self.assertEqual(ret, {'sda': nt(100.0, 2), 'free': 900})
+
     def test_serialization(self):
         def check(ret):
             if json is not None:
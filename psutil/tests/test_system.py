@@ -16,6 +16,7 @@ import signal
 import socket
 import sys
 import tempfile
+import threading
 import time
 
 import psutil
@@ -424,6 +425,94 @@ class TestSystemAPIs(unittest.TestCase):
         os.mkdir(TESTFN_UNICODE)
         psutil.disk_usage(TESTFN_UNICODE)
 
+    @unittest.skipUnless(POSIX, 'POSIX only')
+    def test_disk_usage_all(self):
+        ret = psutil.disk_usage_all()
+        for part in psutil.disk_partitions():
+            if ret.get(part.mountpoint) is None:
+                continue
+            usage = ret[part.mountpoint]
+            self.assertEqual(usage.total,
+                             psutil.disk_usage(part.mountpoint).total)
+            self.assertGreaterEqual(usage.inodes_total, usage.inodes_free)
+            self.assertEqual(usage.inodes_used,
+                             usage.inodes_total - usage.inodes_free)
+        self.assertRaises(ValueError, psutil.disk_usage_all, workers=0)
+
+    @unittest.skipUnless(POSIX, 'POSIX only')
+    def test_disk_usage_all_timeout(self):
+        # a hung mountpoint is reported as None and is not queried
+        # again until the pending call returns
+        def disk_usage_inodes(path):
+            calls.append(path)
+            if path == '/hung':
+                event.wait()
+            elif path == '/denied':
+                raise OSError(errno.EACCES, "")
+            return orig_disk_usage_inodes('/')
+
+        nt = psutil._common.sdiskpart
+        parts = [nt('a', '/', 'ext4', ''), nt('b', '/hung', 'nfs', ''),
+                 nt('c', '/denied', 'ext4', '')]
+        calls = []
+        event = threading.Event()
+        self.addCleanup(event.set)
+        orig_disk_usage_inodes = psutil._psplatform.disk_usage_inodes
+        with mock.patch('psutil.disk_partitions', return_value=parts):
+            with mock.patch('psutil._psplatform.disk_usage_inodes',
+                            side_effect=disk_usage_inodes):
+                ret = psutil.disk_usage_all(timeout=0.5, workers=2)
+                self.assertEqual(sorted(ret), ['/', '/hung'])
+                self.assertIsNone(ret['/hung'])
+                self.assertGreater(ret['/'].inodes_total, 0)
+                ret = psutil.disk_usage_all(timeout=0.5)
+                self.assertIsNone(ret['/hung'])
+                self.assertEqual(calls.count('/hung'), 1)
+                event.set()
+                while '/hung' in psutil._disk_usage_pending:
+                    time.sleep(0.01)
+                ret = psutil.disk_usage_all(timeout=0.5)
+                self.assertIsNotNone(ret['/hung'])
+
+    @unittest.skipUnless(POSIX, 'POSIX only')
+    def test_disk_usage_all_many_hung(self):
+        # healthy mountpoints are answered even if more mountpoints
+        # than workers hang; threads stuck on a hung mountpoint are
+        # replaced, and only once
+        def disk_usage_inodes(path):
+            calls.append(path)
+            if path != '/':
+                event.wait()
+            return orig_disk_usage_inodes('/')
+
+        nt = psutil._common.sdiskpart
+        parts = [nt('x', '/hung%s' % i, 'nfs', '') for i in range(20)]
+        parts.append(nt('a', '/', 'ext4', ''))
+        calls = []
+        event = threading.Event()
+        self.addCleanup(event.set)
+        orig_disk_usage_inodes = psutil._psplatform.disk_usage_inodes
+        nthreads = threading.active_count()
+        with mock.patch('psutil.disk_partitions', return_value=parts):
+            with mock.patch('psutil._psplatform.disk_usage_inodes',
+                            side_effect=disk_usage_inodes):
+                with mock.patch('psutil._DISK_USAGE_HUNG_AFTER', 0.05):
+                    ret = psutil.disk_usage_all(timeout=5, workers=4)
+                    self.assertEqual(len(ret), 21)
+                    self.assertGreater(ret['/'].inodes_total, 0)
+                    for i in range(20):
+                        self.assertIsNone(ret['/hung%s' % i])
+                    self.assertEqual(sorted(calls),
+                                     sorted([x.mountpoint for x in parts]))
+                    self.assertLessEqual(threading.active_count(),
+                                         nthreads + 20)
+                    # hung mountpoints are not queried again
+                    ret = psutil.disk_usage_all(timeout=5, workers=4)
+                    self.assertEqual(len(calls), 22)
+                    self.assertIsNone(ret['/hung0'])
+                    self.assertLessEqual(threading.active_count(),
+                                         nthreads + 20)
+
     @unittest.skipIf(POSIX and not hasattr(os, 'statvfs'),
                      "os.statvfs() function not available on this platform")
     @unittest.skipIf(LINUX and TRAVIS, "unknown failure on travis")
@@ -502,6 +591,109 @@ class TestSystemAPIs(unittest.TestCase):
             self.assertEqual(len(cons), len(set(cons)))
             check(cons, families, types_)
 
+    @skip_on_access_denied()
+    def test_iter_connections(self):
+        gen = psutil.iter_connections('all')
+        self.assertFalse(isinstance(gen, list))
+        cons = list(gen)
+        self.assertEqual(set(cons), set(psutil.net_connections('all')))
+        cons = list(psutil.iter_connections('all', unique=True))
+        self.assertEqual(len(cons), len(set(cons)))
+        self.assertRaises(ValueError, psutil.iter_connections, '???')
+
+    @skip_on_access_denied()
+    def test_net_connections_summary(self):
+        server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.addCleanup(server.close)
+        server.bind(('127.0.0.1', 0))
+        server.listen(1)
+        port = server.getsockname()[1]
+        pid = os.getpid()
+
+        summary = psutil.net_connections_summary('tcp4')
+        self.assertGreaterEqual(summary[(pid, psutil.CONN_LISTEN)], 1)
+        summary = psutil.net_connections_summary(
+            'tcp4', group_by=('lport', 'status', 'pid'))
+        self.assertEqual(summary[(port, psutil.CONN_LISTEN, pid)], 1)
+        summary = psutil.net_connections_summary('tcp4', group_by='lport')
+        self.assertEqual(summary[port], 1)
+        # unicode on Python 2
+        self.assertEqual(
+            psutil.net_connections_summary('tcp4', group_by=u'lport'),
+            summary)
+        for value in psutil.net_connections_summary('all', 'family'):
+            self.assertIn(value, (socket.AF_INET, socket.AF_INET6,
+                                  getattr(socket, 'AF_UNIX', None)))
+        self.assertRaises(ValueError, psutil.net_connections_summary,
+                          'inet', 'laddr')
+        self.assertRaises(ValueError, psutil.net_connections_summary,
+                          'inet', ())
+        self.assertRaises(ValueError, psutil.net_connections_summary, '???')
+
+    @skip_on_access_denied()
+    def test_pid_for_port(self):
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.addCleanup(sock.close)
+        sock.bind(('127.0.0.1', 0))
+        port = sock.getsockname()[1]
+        # not listening yet
+        self.assertIsNone(psutil.pid_for_port(port))
+        sock.listen(1)
+        self.assertEqual(psutil.pid_for_port(port), os.getpid())
+        self.assertEqual(psutil.pid_for_port(port, kind='tcp4', status=None),
+                         os.getpid())
+        self.assertIsNone(psutil.pid_for_port(port, kind='udp'))
+        udp = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.addCleanup(udp.close)
+        udp.bind(('127.0.0.1', 0))
+        self.assertEqual(
+            psutil.pid_for_port(udp.getsockname()[1], kind='udp',
+                                status=psutil.CONN_NONE),
+            os.getpid())
+
+    @skip_on_access_denied()
+    def test_net_connections_filters(self):
+        server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.addCleanup(server.close)
+        server.bind(('127.0.0.1', 0))
+        server.listen(1)
+        client = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.addCleanup(client.close)
+        client.connect(server.getsockname())
+        accepted = server.accept()[0]
+        self.addCleanup(accepted.close)
+        port = server.getsockname()[1]
+        pid = os.getpid()
+
+        cons = psutil.net_connections('tcp4', lport=port)
+        self.assertEqual(set([c.status for c in cons]),
+                         set([psutil.CONN_LISTEN, psutil.CONN_ESTABLISHED]))
+        for conn in cons:
+            self.assertEqual(conn.laddr[1], port)
+        cons = psutil.net_connections('tcp4', status=psutil.CONN_LISTEN,
+                                      lport=port)
+        self.assertEqual(len(cons), 1)
+        self.assertEqual(cons[0].laddr, server.getsockname())
+        # unicode on Python 2
+        self.assertEqual(
+            psutil.net_connections('tcp4', status=u'LISTEN', lport=port),
+            cons)
+        cons = psutil.net_connections('tcp4', rport=port)
+        self.assertEqual([c.laddr for c in cons], [client.getsockname()])
+        self.assertEqual(cons[0].status, psutil.CONN_ESTABLISHED)
+        cons = psutil.net_connections(
+            'tcp4', status=(psutil.CONN_ESTABLISHED, psutil.CONN_LISTEN),
+            lport=port, pid=pid)
+        self.assertEqual(len(cons), 2)
+        for conn in cons:
+            self.assertEqual(conn.pid, pid)
+        self.assertEqual(
+            psutil.net_connections('tcp4', status=psutil.CONN_NONE), [])
+        self.assertEqual(
+            psutil.net_connections('udp4', status=psutil.CONN_LISTEN), [])
+        self.assertEqual(
+            psutil.net_connections('unix', lport=port), [])
+
     def test_net_io_counters(self):
         def check_ntuple(nt):
             self.assertEqual(nt[0], nt.bytes_sent)
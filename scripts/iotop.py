@@ -90,46 +90,46 @@ def bytes2human(n):
     return '%.2f B/s' % (n)
 
 
-def poll(interval):
-    """Calculate IO usage by comparing IO statics before and
-    after the interval.
-    Return a tuple including all currently running processes
-    sorted by IO activity and total disks I/O activity.
+def procs_io_counters():
+    """Return a {Process: io_counters} dict of all the processes
+    whose IO counters can be retrieved.
     """
-    # first get a list of all processes and disk io counters
-    procs = [p for p in psutil.process_iter()]
-    for p in procs[:]:
+    ret = {}
+    for p in psutil.process_iter():
         try:
-            p._before = p.io_counters()
+            ret[p] = p.io_counters()
         except psutil.Error:
-            procs.remove(p)
-            continue
-    disks_before = psutil.disk_io_counters()
+            pass
+    return ret
 
-    # sleep some time
-    time.sleep(interval)
 
-    # then retrieve the same info again
-    for p in procs[:]:
+procs_io = psutil.RateTracker(procs_io_counters)
+disks_io = psutil.RateTracker(psutil.disk_io_counters)
+
+
+def poll():
+    """Calculate IO usage of processes and disks since the previous
+    call.
+    Return a tuple including all currently running processes
+    sorted by IO activity and total disks I/O activity.
+    """
+    procs = []
+    for p, rates in procs_io.rates().items():
         try:
-            p._after = p.io_counters()
             p._cmdline = ' '.join(p.cmdline())
             if not p._cmdline:
                 p._cmdline = p.name()
             p._username = p.username()
         except (psutil.NoSuchProcess, psutil.ZombieProcess):
-            procs.remove(p)
-    disks_after = psutil.disk_io_counters()
-
-    # finally calculate results by comparing data before and
-    # after the interval
-    for p in procs:
-        p._read_per_sec = p._after.read_bytes - p._before.read_bytes
-        p._write_per_sec = p._after.write_bytes - p._before.write_bytes
+            continue
+        p._read_per_sec = rates.read_bytes
+        p._write_per_sec = rates.write_bytes
         p._total = p._read_per_sec + p._write_per_sec
+        procs.append(p)
 
-    disks_read_per_sec = disks_after.read_bytes - disks_before.read_bytes
-    disks_write_per_sec = disks_after.write_bytes - disks_before.write_bytes
+    disks_rates = disks_io.rates()
+    disks_read_per_sec = disks_rates.read_bytes
+    disks_write_per_sec = disks_rates.write_bytes
 
     # sort processes by total disk IO so that the more intensive
     # ones get listed first
@@ -167,11 +167,10 @@ def refresh_window(procs, disks_read, disks_write):
 
 def main():
     try:
-        interval = 0
         while True:
-            args = poll(interval)
+            args = poll()
             refresh_window(*args)
-            interval = 1
+            time.sleep(1)
     except (KeyboardInterrupt, SystemExit):
         pass
 
@@ -91,60 +91,59 @@ def bytes2human(n):
     return '%.2f B' % (n)
 
 
-def poll(interval):
-    """Retrieve raw stats within an interval window."""
-    tot_before = psutil.net_io_counters()
-    pnic_before = psutil.net_io_counters(pernic=True)
-    # sleep some time
-    time.sleep(interval)
-    tot_after = psutil.net_io_counters()
-    pnic_after = psutil.net_io_counters(pernic=True)
-    return (tot_before, tot_after, pnic_before, pnic_after)
-
-
-def refresh_window(tot_before, tot_after, pnic_before, pnic_after):
+nics = psutil.RateTracker(lambda: psutil.net_io_counters(pernic=True))
+
+
+def poll():
+    """Retrieve per-interface counters and their per-second rates
+    since the previous call.
+    """
+    pnic_rates = nics.rates()
+    return (nics.counters(), pnic_rates)
+
+
+def refresh_window(pnic, pnic_rates):
     """Print stats on screen."""
     global lineno
 
     # totals
     print_line("total bytes:           sent: %-10s   received: %s" % (
-        bytes2human(tot_after.bytes_sent),
-        bytes2human(tot_after.bytes_recv))
+        bytes2human(sum([x.bytes_sent for x in pnic.values()])),
+        bytes2human(sum([x.bytes_recv for x in pnic.values()])))
     )
     print_line("total packets:         sent: %-10s   received: %s" % (
-        tot_after.packets_sent, tot_after.packets_recv))
+        sum([x.packets_sent for x in pnic.values()]),
+        sum([x.packets_recv for x in pnic.values()])))
 
     # per-network interface details: let's sort network interfaces so
     # that the ones which generated more traffic are shown first
     print_line("")
-    nic_names = list(pnic_after.keys())
-    nic_names.sort(key=lambda x: sum(pnic_after[x]), reverse=True)
+    nic_names = list(pnic.keys())
+    nic_names.sort(key=lambda x: sum(pnic[x]), reverse=True)
     for name in nic_names:
-        stats_before = pnic_before[name]
-        stats_after = pnic_after[name]
+        stats = pnic[name]
+        rates = pnic_rates[name]
         templ = "%-15s %15s %15s"
         print_line(templ % (name, "TOTAL", "PER-SEC"), highlight=True)
         print_line(templ % (
             "bytes-sent",
-            bytes2human(stats_after.bytes_sent),
-            bytes2human(
-                stats_after.bytes_sent - stats_before.bytes_sent) + '/s',
+            bytes2human(stats.bytes_sent),
+            bytes2human(rates.bytes_sent) + '/s',
         ))
         print_line(templ % (
             "bytes-recv",
-            bytes2human(stats_after.bytes_recv),
-            bytes2human(
-                stats_after.bytes_recv - stats_before.bytes_recv) + '/s',
+            bytes2human(stats.bytes_recv),
+            bytes2human(rates.bytes_recv) + '/s',
         ))
         print_line(templ % (
             "pkts-sent",
-            stats_after.packets_sent,
-            stats_after.packets_sent - stats_before.packets_sent,
+            stats.packets_sent,
+            int(round(rates.packets_sent)),
         ))
         print_line(templ % (
             "pkts-recv",
-            stats_after.packets_recv,
-            stats_after.packets_recv - stats_before.packets_recv,
+            stats.packets_recv,
+            int(round(rates.packets_recv)),
         ))
         print_line("")
     win.refresh()
@@ -153,11 +152,10 @@ def refresh_window(tot_before, tot_after, pnic_before, pnic_after):
 
 def main():
     try:
-        interval = 0
         while True:
-            args = poll(interval)
+            args = poll()
             refresh_window(*args)
-            interval = 1
+            time.sleep(1)
     except (KeyboardInterrupt, SystemExit):
         pass
 